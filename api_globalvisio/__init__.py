@@ -1,4 +1,7 @@
 from .core import *
+from .catalog import Catalog
+from .aio import AsyncGlobalVisioClient
+from .sync import HistorySync
 
 """
 Réinstallation d'un package Python localement:
@@ -0,0 +1,327 @@
+import asyncio
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp est optionnel (pip install api_globalvisio[async])
+    aiohttp = None
+
+from .core import MAX_CONSUMPTION_WINDOW, _split_period, _total_pages, credentials, history_window, transport
+from .metrics import metrics
+from .processing import normalize_samples, records_to_lists, save_payloads, to_hourly
+from .records import PointRecord, loads
+from .scheduler import RETRY_STATUS_CODES, parse_retry_after
+
+
+class AsyncGlobalVisioClient:
+    """
+    Client asynchrone (asyncio) de l'API de GlobalVisio.
+    Toutes les requêtes partagent un même pool de connexions aiohttp, et au plus
+    max_concurrency requêtes sont en cours simultanément.
+
+    async with AsyncGlobalVisioClient(api_key) as client:
+        histories = await asyncio.gather(*(client.get_history(i, '2023-01-01', '2024-01-01') for i in ids))
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=32, timeout=120, max_retries=5,
+                 backoff_max=60.0):
+        """
+        api_key et base_url valent par défaut ceux de la configuration synchrone (credentials, transport).
+        """
+        if aiohttp is None:
+            raise ImportError("Le client asynchrone nécessite aiohttp: pip install api_globalvisio[async]")
+        self.api_key = api_key if api_key is not None else credentials.api_key
+        self.base_url = (base_url or transport.base_url).rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_max = backoff_max
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            headers = {'Content-Type': 'application/json'}
+            if self.api_key:
+                headers['Authorization'] = f'Bearer {self.api_key}'
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        """
+        Ferme la session et libère les connexions.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, method, path, **kwargs):
+        """
+        Envoie une requête et renvoie (code HTTP, corps JSON décodé).
+        Les réponses 429/503 sont retentées après Retry-After ou une attente exponentielle avec gigue.
+        """
+        session = self._get_session()
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.request(method, url, **kwargs) as response:
+                        if 'X-RateLimit-Remaining' in response.headers:
+                            credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+                        status = response.status
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        content = await response.read()
+                except Exception as e:
+                    metrics.record(path, method, latency=time.perf_counter() - start, retry=attempt > 0, error=e)
+                    raise
+                metrics.record(path, method, status, time.perf_counter() - start, len(content), retry=attempt > 0,
+                               rate_limit_remaining=response.headers.get('X-RateLimit-Remaining'))
+
+            if status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = retry_after if retry_after is not None else random.uniform(0, 2 ** attempt)
+                await asyncio.sleep(min(delay, self.backoff_max))
+                attempt += 1
+                continue
+            return status, loads(content) if content else {}
+
+    async def _get_response(self, path, context, key):
+        """
+        Requête GET renvoyant body['response'][key], ou None (avec un message d'erreur) en cas d'échec.
+        """
+        try:
+            status, body = await self._request('GET', path)
+            if status != 200:
+                print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {body.get('message', '')}")
+                return None
+            if body['response'][key]:
+                return body['response'][key]
+            print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: données inexistantes")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {e}")
+            return None
+        except json.JSONDecodeError:
+            print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+            return None
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            return None
+
+    async def _get_sites_page(self, page, per_page):
+        """
+        Récupère une page de sites: renvoie (liste de sites, contenu de 'response'), ou None en cas d'erreur.
+        """
+        context = 'des sites'
+        try:
+            status, body = await self._request('GET', f'sites/index?page={page}&perPage={per_page}')
+            if status != 200:
+                print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {body.get('message', '')}")
+                return None
+            return list(body['response']['sites'] or []), body['response']
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {e}")
+            return None
+        except json.JSONDecodeError:
+            print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+            return None
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            return None
+
+    async def get_all_sites(self, per_page=100, wave=4):
+        """
+        Récupère tous les sites. Les pages suivant la première sont demandées simultanément
+        (par vagues de `wave` pages si l'API n'indique pas le nombre total de sites).
+        Si l'API plafonne la taille des pages, la taille de la première page est utilisée pour les suivantes
+        (voir iter_site_pages).
+        """
+        first = await self._get_sites_page(0, per_page)
+        if first is None:
+            return None
+        sites, content = first
+
+        page = 1
+        # Taille réelle des pages: une première page incomplète peut venir d'un plafond de l'API
+        total_pages = _total_pages(content, min(per_page, len(sites))) if sites else None
+        if total_pages is None:
+            complete = len(sites) == per_page
+        else:
+            complete = total_pages > 1
+            per_page = min(per_page, len(sites))
+        while complete:
+            last_page = total_pages if total_pages is not None else page + wave
+            pages = await asyncio.gather(*(self._get_sites_page(number, per_page)
+                                           for number in range(page, last_page)))
+            if any(result is None for result in pages):
+                return None
+            for page_sites, _ in pages:
+                sites.extend(page_sites)
+            complete = total_pages is None and all(len(page_sites) == per_page for page_sites, _ in pages)
+            page = last_page
+
+        if not sites:
+            print("ERREUR lors de la requête des sites avec l'API de GlobalVisio: données inexistantes")
+            return None
+        return pd.DataFrame(sites)
+
+    async def get_all_devices(self, site_id):
+        """
+        Récupère la liste des équipements d'un site.
+        """
+        devices = await self._get_response(f'devices/listBySite/{site_id}', f"d'équipements du site {site_id}",
+                                           'devices')
+        return pd.DataFrame(devices) if devices else None
+
+    async def get_all_points(self, device_id):
+        """
+        Récupère la liste des points d'un équipement.
+        """
+        device = await self._get_response(f'devices/index/{device_id}', f"de points de l'équipement {device_id}",
+                                          'device')
+        if device is None:
+            return None
+        try:
+            return pd.DataFrame(device['points']) if device['points'] else None
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            return None
+
+    async def get_point_attributes(self, point_id):
+        """
+        Récupère les attributs d'un point sous forme de PointRecord.
+        """
+        point = await self._get_response(f'points/index/{point_id}', f"d'attributs du point {point_id}", 'point')
+        if point is None:
+            return None
+        try:
+            return PointRecord.from_json(point)
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            return None
+
+    async def _get_windows(self, point_id, start, end, max_diff, path, context, key):
+        """
+        Récupère simultanément toutes les sous-périodes et les normalise en une seule passe.
+        Renvoie None si l'une des sous-requêtes a échoué.
+        """
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+        windows = _split_period(start_date, end_date, max_diff)
+
+        async def fetch(sub_start, sub_end):
+            try:
+                status, body = await self._request('GET', path.format(id=point_id, start=sub_start, end=sub_end))
+                if status != 200:
+                    print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {body.get('message', '')}")
+                    return None
+                if body['response'][key]:
+                    return records_to_lists(body['response'][key])
+                print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: données inexistantes "
+                      f"pour le point {point_id} entre {sub_start} et {sub_end}")
+                return [], []
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"ERREUR lors de la requête {context} avec l'API de GlobalVisio: {e}")
+                return None
+            except json.JSONDecodeError:
+                print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+                return None
+            except KeyError:
+                print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+                return None
+
+        results = await asyncio.gather(*(fetch(sub_start, sub_end) for sub_start, sub_end in windows))
+        if any(result is None for result in results):
+            return None
+        dates = [date for sub_dates, _ in results for date in sub_dates]
+        values = [value for _, sub_values in results for value in sub_values]
+        return dates, values
+
+    async def get_history(self, point_id, start, end, is_counter_index=True):
+        """
+        Équivalent asynchrone de Point.get_history: historique horaire d'un point.
+        Dates au format 'yyyy-mm-dd'.
+        """
+        result = await self._get_windows(point_id, start, end, history_window(point_id),
+                                         'points/history/{id}?dateStart={start}&dateEnd={end}',
+                                         "d'historique", 'history')
+        if result is None:
+            return None
+        return to_hourly(normalize_samples(*result), is_counter_index)
+
+    async def get_consumption_day(self, point_id, start, end):
+        """
+        Équivalent asynchrone de Point.get_consumption_day: consommation journalière d'un point.
+        Dates au format 'yyyy-mm-dd'.
+        """
+        result = await self._get_windows(point_id, start, end, MAX_CONSUMPTION_WINDOW,
+                                         'points/consumption/{id}?dateStart={start}&dateEnd={end}&period=2',
+                                         'de consommation journalière', 'consumption')
+        if result is None:
+            return None
+        data = normalize_samples(*result, sort_values=False)
+        return data if not data.empty else None
+
+    async def save_history(self, point_id, data, batch_size=5000, max_bytes=5 * 1024 * 1024, retries=3,
+                           compress=False):
+        """
+        Équivalent asynchrone de Point.save_history: enregistre l'historique d'un point virtuel dédié à l'API.
+        Les lots sont envoyés simultanément et seuls les lots en échec sont renvoyés.
+        Renvoie True si tous les lots ont été enregistrés, False sinon (None si le point n'est pas dédié à l'API).
+        """
+        point = await self.get_point_attributes(point_id)
+        if point is None:
+            return False
+        labels = [label.lower() for label in (point.label_automate, point.label_humain) if label]
+        if not any(' api' in label for label in labels):
+            print(f'ERREUR: vous essayez de modifier la valeur d\'un point de l\'équipement non dédié '
+                  f'à l\'API: {point.label_humain}')
+            return None
+
+        async def send(payload):
+            headers = None
+            if compress:
+                payload = gzip.compress(payload)
+                headers = {'Content-Encoding': 'gzip'}
+            try:
+                status, body = await self._request('POST', f'points/saveConsumption/{point_id}', data=payload,
+                                                   headers=headers)
+                if status != 200:
+                    print(f"ERREUR lors de la requête d'enregistrement de données sur le point {point_id} avec "
+                          f"l'API de GlobalVisio: {body.get('message', '')}")
+                    return False
+                return True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"ERREUR lors de la requête d'enregistrement de données sur le point {point_id} avec "
+                      f"l'API de GlobalVisio: {e}")
+            except json.JSONDecodeError:
+                print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+            return False
+
+        pending = save_payloads(data, batch_size, max_bytes)
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(min(30, 2 ** (attempt - 1)))
+            sent = await asyncio.gather(*(send(payload) for payload in pending))
+            pending = [payload for payload, ok in zip(pending, sent) if not ok]
+            if not pending:
+                return True
+
+        print(f"ERREUR: {len(pending)} lot(s) n'ont pas pu être enregistrés sur le point {point_id}")
+        return False
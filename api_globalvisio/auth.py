@@ -0,0 +1,216 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+PARIS_TIMEZONE = pytz.timezone('Europe/Paris')
+
+
+def _file_key(key, salt):
+    """
+    Empreinte salée et coûteuse (scrypt) des identifiants, seule enregistrée dans le fichier du token:
+    le fichier ne permet pas de retrouver le mot de passe par une recherche exhaustive rapide.
+    """
+    material = (key or '').encode('utf-8')
+    try:
+        return hashlib.scrypt(material, salt=salt, n=2 ** 14, r=8, p=1).hex()
+    except AttributeError:
+        # Python compilé sans scrypt (OpenSSL ancien)
+        return hashlib.pbkdf2_hmac('sha256', material, salt, 200000).hex()
+
+
+class TokenProvider:
+    """
+    Fournit le token d'authentification de GlobalVisio.
+    Un seul thread à la fois demande un nouveau token (les autres attendent son résultat),
+    le token est renouvelé en arrière-plan peu avant son expiration,
+    et il peut être conservé dans un fichier pour être réutilisé par les processus suivants.
+    """
+
+    def __init__(self, fetch, state=None, refresh_margin=300, cache_path=None):
+        """
+        fetch: fonction sans argument renvoyant (token, expiration) ou None en cas d'échec.
+        state: dictionnaire {'token', 'expiration'} tenu à jour (token_info du module core).
+        refresh_margin: délai en secondes avant l'expiration à partir duquel le token est renouvelé
+        (limité à la moitié de la durée de vie du token, pour les tokens de courte durée).
+        cache_path: fichier JSON où le token est enregistré (None pour ne pas l'enregistrer).
+        """
+        self.fetch = fetch
+        self.state = state if state is not None else {'token': None, 'expiration': None}
+        self.state.setdefault('key', None)
+        self.refresh_margin = refresh_margin
+        self.cache_path = cache_path
+        self.key = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._timer = None
+        self._lifetime = None
+        self._file_keys = {}
+
+    def _now(self):
+        return datetime.now(PARIS_TIMEZONE)
+
+    def _valid(self, margin=0):
+        """
+        Indique si le token courant appartient à l'utilisateur courant et expire dans plus de `margin` secondes.
+        """
+        token, expiration = self.state.get('token'), self.state.get('expiration')
+        return bool(token) and expiration is not None and self.state.get('key') == self.key \
+            and expiration - timedelta(seconds=margin) > self._now()
+
+    def _margin(self):
+        """
+        Marge de renouvellement effective: refresh_margin, au plus la moitié de la durée de vie du token courant.
+        """
+        if self._lifetime is None:
+            return self.refresh_margin
+        return min(self.refresh_margin, self._lifetime / 2)
+
+    def current(self, key=None):
+        """
+        Renvoie le token courant s'il est valide pour les identifiants `key`, sans requête, sinon None.
+        """
+        self.key = key
+        if not self._valid() and self.cache_path:
+            self._read()
+        return self.state['token'] if self._valid() else None
+
+    def get(self, key=None):
+        """
+        Renvoie un token valide pour les identifiants `key` (empreinte de l'utilisateur et du mot de passe),
+        en le demandant à l'API si nécessaire, ou None en cas d'échec.
+        """
+        if self.current(key) is not None:
+            if not self._valid(self._margin()):
+                self._refresh_in_background()
+            return self.state['token']
+
+        with self._lock:
+            # Un autre thread a pu obtenir le token pendant l'attente du verrou
+            if self._valid():
+                return self.state['token']
+            return self._refresh()
+
+    def set(self, token, expiration):
+        """
+        Enregistre un token obtenu par ailleurs (par exemple lors de check_user_exists).
+        """
+        if expiration.tzinfo is None:
+            expiration = PARIS_TIMEZONE.localize(expiration)
+        self.state['token'] = token
+        self.state['expiration'] = expiration
+        self.state['key'] = self.key
+        self._lifetime = (expiration - self._now()).total_seconds()
+        self._write()
+        self._schedule()
+
+    def invalidate(self):
+        """
+        Oublie le token courant (il sera redemandé au prochain appel), y compris dans le fichier cache_path.
+        """
+        with self._lock:
+            token = self.state['token']
+            self.state['token'] = None
+            self.state['expiration'] = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._forget(token)
+
+    def _forget(self, token):
+        """
+        Supprime le fichier cache_path s'il contient le token invalidé (ou un contenu illisible).
+        Un token plus récent écrit par un autre processus est conservé.
+        """
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                cached_token = json.load(file).get('token')
+        except OSError:
+            return
+        except ValueError:
+            cached_token = token
+        if token is None or cached_token == token:
+            try:
+                os.remove(self.cache_path)
+            except OSError as e:
+                print(f"ERREUR lors de la suppression du token enregistré {self.cache_path}: {e}")
+
+    def _refresh(self):
+        result = self.fetch()
+        if result is None:
+            return None
+        self.set(*result)
+        return self.state['token']
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with self._lock:
+                    if not self._valid(self._margin()):
+                        self._refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _schedule(self):
+        """
+        Programme le renouvellement du token peu avant son expiration (voir _margin).
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        delay = (self.state['expiration'] - self._now()).total_seconds() - self._margin()
+        if delay <= 0:
+            # Token déjà dans sa marge de renouvellement: il sera renouvelé lors d'un prochain appel à get
+            return
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _derive(self, salt):
+        # Dérivation mémorisée: scrypt n'est calculé qu'une fois par identifiants et par fichier
+        if (self.key, salt) not in self._file_keys:
+            self._file_keys[(self.key, salt)] = _file_key(self.key, salt)
+        return self._file_keys[(self.key, salt)]
+
+    def _read(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            expiration = datetime.fromisoformat(content['expiration'])
+            salt = bytes.fromhex(content['salt'])
+            key = content['key']
+        except (OSError, ValueError, KeyError, TypeError):
+            # Fichier absent, illisible, ou écrit par une version antérieure (empreinte non salée)
+            return
+        if isinstance(key, str) and hmac.compare_digest(key, self._derive(salt)):
+            self.state['token'] = content['token']
+            self.state['expiration'] = expiration
+            self.state['key'] = self.key
+            # Durée de vie d'origine inconnue: la durée restante sert de référence pour la marge
+            self._lifetime = (expiration - self._now()).total_seconds()
+
+    def _write(self):
+        if not self.cache_path:
+            return
+        salt = os.urandom(16)
+        content = {'salt': salt.hex(), 'key': self._derive(salt), 'token': self.state['token'],
+                   'expiration': self.state['expiration'].isoformat()}
+        temporary_path = f'{self.cache_path}.tmp'
+        # Le fichier n'est lisible que par l'utilisateur courant
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(content, file)
+        os.replace(temporary_path, self.cache_path)
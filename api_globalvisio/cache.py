@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytz
+
+PARIS_TIMEZONE = pytz.timezone('Europe/Paris')
+EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+class HistoryCache:
+    """
+    Cache local (SQLite) des historiques de points.
+    Les valeurs sont stockées par type de donnée ('history', 'consumption'), par point et par date,
+    et une table de couverture enregistre les jours déjà entièrement téléchargés,
+    afin de ne demander à l'API que les périodes manquantes.
+    Les équipements envoyant leurs relevés par lots, un jour n'est marqué comme couvert que `settle` après sa fin
+    (et seulement s'il s'achève avant la dernière connexion connue de l'équipement): un jour téléchargé trop tôt
+    sera redemandé.
+    """
+
+    def __init__(self, path='globalvisio_cache.sqlite', settle=timedelta(hours=6)):
+        """
+        Ouvre (ou crée) la base SQLite du cache.
+        settle: délai après la fin d'un jour avant de le considérer comme complet sur le serveur.
+        """
+        self.path = path
+        self.settle = settle
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'kind TEXT NOT NULL, point_id INTEGER NOT NULL, date_ms INTEGER NOT NULL, value REAL, '
+                'PRIMARY KEY (kind, point_id, date_ms))'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS coverage ('
+                'kind TEXT NOT NULL, point_id INTEGER NOT NULL, day TEXT NOT NULL, '
+                'PRIMARY KEY (kind, point_id, day))'
+            )
+
+    def covered_days(self, kind, point_id, start_date, end_date):
+        """
+        Renvoie l'ensemble des jours ('yyyy-mm-dd') déjà couverts entre start_date (inclus) et end_date (exclu).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT day FROM coverage WHERE kind = ? AND point_id = ? AND day >= ? AND day < ?',
+                (kind, int(point_id), start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def missing_periods(self, kind, point_id, start_date, end_date):
+        """
+        Renvoie la liste des périodes (début, fin exclue) non couvertes par le cache
+        entre start_date et end_date, sous forme d'objets datetime.
+        """
+        covered = self.covered_days(kind, point_id, start_date, end_date)
+        periods = []
+        period_start = None
+        day = start_date
+        while day < end_date:
+            if day.strftime('%Y-%m-%d') in covered:
+                if period_start is not None:
+                    periods.append((period_start, day))
+                    period_start = None
+            elif period_start is None:
+                period_start = day
+            day += timedelta(days=1)
+        if period_start is not None:
+            periods.append((period_start, end_date))
+        return periods
+
+    def store(self, kind, point_id, windows, data, until=None):
+        """
+        Enregistre les valeurs téléchargées et marque comme couverts les jours des sous-périodes
+        windows (liste de tuples (début, fin exclue) au format 'yyyy-mm-dd').
+        Les jours qui ne sont pas écoulés depuis au moins `settle` (Europe/Paris) ne sont pas marqués,
+        ni ceux qui s'achèvent après until (dernière connexion de l'équipement, datetime sans fuseau en heure de Paris).
+        """
+        limit = datetime.now(PARIS_TIMEZONE).replace(tzinfo=None) - self.settle
+        if until is not None:
+            limit = min(limit, until)
+        # Dernier jour pouvant être marqué: celui qui s'achève au plus tard à limit
+        last_day = limit.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rows = []
+        if data is not None and not data.empty:
+            dates_ms = (data.index.tz_convert('UTC') - EPOCH) // pd.Timedelta(milliseconds=1)
+            rows = [(kind, int(point_id), int(date_ms), None if pd.isna(value) else float(value))
+                    for date_ms, value in zip(dates_ms, data['value'])]
+
+        days = []
+        for sub_start, sub_end in windows:
+            day = datetime.strptime(sub_start, '%Y-%m-%d')
+            end_date = min(datetime.strptime(sub_end, '%Y-%m-%d'), last_day)
+            while day < end_date:
+                days.append((kind, int(point_id), day.strftime('%Y-%m-%d')))
+                day += timedelta(days=1)
+
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?)', rows)
+            self._connection.executemany('INSERT OR IGNORE INTO coverage VALUES (?, ?, ?)', days)
+
+    def load(self, kind, point_id, start_date, end_date):
+        """
+        Renvoie les valeurs en cache entre start_date (inclus) et end_date (exclu), heure de Paris,
+        sous forme de DataFrame indexé par date.
+        """
+        start_ms = (pd.Timestamp(PARIS_TIMEZONE.localize(start_date)) - EPOCH) // pd.Timedelta(milliseconds=1)
+        end_ms = (pd.Timestamp(PARIS_TIMEZONE.localize(end_date)) - EPOCH) // pd.Timedelta(milliseconds=1)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT date_ms, value FROM samples WHERE kind = ? AND point_id = ? AND date_ms >= ? AND date_ms < ? '
+                'ORDER BY date_ms',
+                (kind, int(point_id), int(start_ms), int(end_ms))
+            ).fetchall()
+
+        data = pd.DataFrame(rows, columns=['date', 'value'])
+        data['date'] = pd.to_datetime(data['date'], unit='ms', utc=True).dt.tz_convert('Europe/Paris')
+        data['value'] = data['value'].astype(float)
+        return data.set_index('date')
+
+    def clear(self, point_id=None):
+        """
+        Vide le cache, pour un point donné ou entièrement.
+        """
+        with self._lock, self._connection:
+            if point_id is None:
+                self._connection.execute('DELETE FROM samples')
+                self._connection.execute('DELETE FROM coverage')
+            else:
+                self._connection.execute('DELETE FROM samples WHERE point_id = ?', (int(point_id),))
+                self._connection.execute('DELETE FROM coverage WHERE point_id = ?', (int(point_id),))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
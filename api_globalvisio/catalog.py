@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import core
+
+
+def _match_words(values, char):
+    """
+    Masque des lignes dont la valeur contient tous les mots de la liste char (sans tenir compte de la casse).
+    """
+    return values.apply(lambda x: all(word.lower() in str(x).lower() for word in char))
+
+
+class Catalog:
+    """
+    Catalogue local de la hiérarchie sites -> équipements -> points.
+    Chaque liste est téléchargée une seule fois puis conservée en mémoire pendant `ttl` secondes,
+    et éventuellement enregistrée dans un fichier JSON entre deux exécutions.
+    Les recherches par mots (get_site_id_from_char, ...) sont effectuées localement.
+    """
+
+    def __init__(self, ttl=3600, path=None):
+        """
+        ttl: durée de validité des listes en secondes (None pour ne jamais les expirer).
+        path: fichier JSON où le catalogue est relu à l'initialisation et enregistré après chaque téléchargement.
+        """
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.RLock()
+        self._sites = None
+        self._devices = {}
+        self._points = {}
+        self._defer_save = False
+        if path and os.path.exists(path):
+            self._read()
+
+    # Gestion des entrées (date de chargement, DataFrame)
+
+    def _fresh(self, entry):
+        return entry is not None and (self.ttl is None or time.time() - entry[0] < self.ttl)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"ERREUR lors de la lecture du catalogue {self.path}: {e}")
+            return
+
+        def to_entry(item):
+            return item['loaded_at'], pd.DataFrame(item['rows'])
+
+        with self._lock:
+            if content.get('sites'):
+                self._sites = to_entry(content['sites'])
+            self._devices = {int(key): to_entry(item) for key, item in content.get('devices', {}).items()}
+            self._points = {int(key): to_entry(item) for key, item in content.get('points', {}).items()}
+
+    def save(self):
+        """
+        Enregistre le catalogue dans le fichier `path`.
+        """
+        if not self.path or self._defer_save:
+            return
+
+        def to_item(entry):
+            return {'loaded_at': entry[0], 'rows': entry[1].to_dict(orient='records')}
+
+        with self._lock:
+            content = {
+                'sites': to_item(self._sites) if self._sites is not None else None,
+                'devices': {str(key): to_item(entry) for key, entry in self._devices.items()},
+                'points': {str(key): to_item(entry) for key, entry in self._points.items()},
+            }
+            temporary_path = f'{self.path}.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                json.dump(content, file, default=str)
+            os.replace(temporary_path, self.path)
+
+    def invalidate(self):
+        """
+        Oublie toutes les listes en mémoire (elles seront téléchargées à nouveau au prochain accès).
+        """
+        with self._lock:
+            self._sites = None
+            self._devices = {}
+            self._points = {}
+
+    def _get(self, store, key, download):
+        entry = store.get(key)
+        if self._fresh(entry):
+            return entry[1]
+        data = download()
+        if data is not None:
+            with self._lock:
+                store[key] = (time.time(), data)
+            self.save()
+        return data
+
+    # Listes
+
+    def get_all_sites(self):
+        """
+        Renvoie tous les sites (téléchargés si absents du catalogue ou expirés).
+        """
+        if self._fresh(self._sites):
+            return self._sites[1]
+        data = core.get_all_sites()
+        if data is not None:
+            with self._lock:
+                self._sites = (time.time(), data)
+            self.save()
+        return data
+
+    def get_all_devices(self, site_id):
+        """
+        Renvoie les équipements d'un site (téléchargés si absents du catalogue ou expirés).
+        """
+        return self._get(self._devices, int(site_id), lambda: core.get_all_devices(site_id))
+
+    def get_all_points(self, device_id):
+        """
+        Renvoie les points d'un équipement (téléchargés si absents du catalogue ou expirés).
+        """
+        return self._get(self._points, int(device_id), lambda: core.get_all_points(device_id))
+
+    def load(self, max_workers=8):
+        """
+        Charge toute la hiérarchie sites -> équipements -> points, en parallèle sur max_workers threads.
+        """
+        sites = self.get_all_sites()
+        if sites is None:
+            return self
+
+        # Le fichier n'est enregistré qu'une fois, à la fin du chargement
+        self._defer_save = True
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                devices = list(executor.map(self.get_all_devices, sites['id'].tolist()))
+                device_ids = [device_id for data in devices if data is not None for device_id in data['id'].tolist()]
+                list(executor.map(self.get_all_points, device_ids))
+        finally:
+            self._defer_save = False
+        self.save()
+        return self
+
+    # Recherches par mots
+
+    def get_site_id_from_char(self, char):
+        """
+        Renvoie l'identifiant de l'unique site dont le nom contient tous les mots de char.
+        """
+        data = self.get_all_sites()
+        if data is None:
+            return None
+
+        condition = _match_words(data['nom'], char)
+        if condition.sum() > 1:
+            print(f"ERREUR lors de la requête du site car plusieurs sites possèdent ces caractères: {char}")
+            return None
+        elif condition.sum() == 1:
+            return data[condition]['id'].astype(int).iloc[0]
+        else:
+            print(f"ERREUR lors de la requête du site car aucun site ne possède ces caractères: {char}")
+            return None
+
+    def get_device_id_from_char(self, site_id, char):
+        """
+        Renvoie la liste triée des équipements du site dont le nom contient tous les mots de char.
+        """
+        data = self.get_all_devices(site_id)
+        if data is None:
+            return None
+
+        condition = _match_words(data['nom'], char)
+        if condition.sum():
+            return sorted(data[condition]['id'].astype(int).to_list())
+        else:
+            print(
+                f"ERREUR lors de la requête d'équipements du site {site_id} car aucun ne possède ces caractères: {char}")
+            return None
+
+    def get_points_id_from_char(self, device_id, char):
+        """
+        Renvoie la liste triée des points de l'équipement dont le libellé contient tous les mots de char.
+        """
+        data = self.get_all_points(device_id)
+        if data is None:
+            return None
+
+        condition = _match_words(data['labelHumain'], char)
+        return sorted(data[condition]['id'].astype(int).to_list())
+
+    def get_all_points_from_site(self, site_id):
+        """
+        Renvoie tous les points des équipements d'un site.
+        """
+        data_devices = self.get_all_devices(site_id)
+        if data_devices is None:
+            return None
+
+        all_data_points = [self.get_all_points(device_id) for device_id in data_devices['id'].tolist()]
+        all_data_points = [data for data in all_data_points if data is not None]
+        if not all_data_points:
+            return None
+        return pd.concat(all_data_points, ignore_index=True)
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+
+class _InFlight:
+    """
+    Sous-requête en cours: période [start, end) et Future de son résultat (dates, valeurs) ou None.
+    """
+    __slots__ = ('start', 'end', 'future')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.future = Future()
+
+
+def _uncovered(start, end, entries):
+    """
+    Renvoie les périodes de [start, end) non couvertes par les périodes des entrées.
+    """
+    periods = []
+    current = start
+    for entry in sorted(entries, key=lambda entry: entry.start):
+        if entry.start > current:
+            periods.append((current, min(entry.start, end)))
+        current = max(current, entry.end)
+        if current >= end:
+            break
+    if current < end:
+        periods.append((current, end))
+    return periods
+
+
+def _restrict(result, start, end):
+    """
+    Ne garde d'un résultat (dates, valeurs) que les relevés des jours [start, end).
+    Le jour d'un relevé est lu dans sa date telle que renvoyée par l'API ('yyyy-mm-dd...'),
+    c'est-à-dire dans le fuseau où l'API interprète dateStart et dateEnd.
+    """
+    lower = start.strftime('%Y-%m-%d')
+    upper = end.strftime('%Y-%m-%d')
+    kept = [(date, value) for date, value in zip(*result) if lower <= str(date)[:10] < upper]
+    return [date for date, _ in kept], [value for _, value in kept]
+
+
+class RequestCoalescer:
+    """
+    Regroupement des sous-requêtes d'historique identiques ou chevauchantes émises en même temps
+    par plusieurs threads (single-flight).
+    Une sous-requête déjà en cours pour le même point, le même type de donnée et la même période
+    n'est pas renvoyée: l'appelant attend son résultat.
+    Si la période demandée chevauche des sous-requêtes en cours, seules les parties non couvertes sont demandées,
+    et les relevés des parties communes sont repris des sous-requêtes en cours.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.coalesced = 0
+
+    def fetch(self, kind, point_id, sub_start, sub_end, fetch):
+        """
+        Renvoie le résultat de fetch(sub_start, sub_end) (tuple (dates, valeurs), ou None en cas d'erreur),
+        en réutilisant les sous-requêtes en cours. Dates au format 'yyyy-mm-dd', fin exclue.
+        """
+        start = datetime.strptime(sub_start, '%Y-%m-%d')
+        end = datetime.strptime(sub_end, '%Y-%m-%d')
+        key = (kind, int(point_id))
+
+        with self._lock:
+            entries = self._in_flight.setdefault(key, [])
+            overlapping = [entry for entry in entries if entry.start < end and entry.end > start]
+            exact = next((entry for entry in overlapping if entry.start == start and entry.end == end), None)
+            if exact is not None:
+                owned, borrowed = [], [(exact, None)]
+            else:
+                owned = [_InFlight(period_start, period_end)
+                         for period_start, period_end in _uncovered(start, end, overlapping)]
+                borrowed = [(entry, (max(start, entry.start), min(end, entry.end))) for entry in overlapping]
+                entries.extend(owned)
+            if borrowed:
+                self.coalesced += 1
+
+        # Les sous-requêtes propres à cet appel sont exécutées avant d'attendre celles des autres threads
+        results = []
+        for entry in owned:
+            try:
+                result = fetch(entry.start.strftime('%Y-%m-%d'), entry.end.strftime('%Y-%m-%d'))
+                entry.future.set_result(result)
+            except BaseException as e:
+                entry.future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    entries = self._in_flight.get(key, [])
+                    if entry in entries:
+                        entries.remove(entry)
+                    if not entries:
+                        self._in_flight.pop(key, None)
+            results.append(result)
+
+        for entry, period in borrowed:
+            result = entry.future.result()
+            if result is not None and period is not None:
+                result = _restrict(result, *period)
+            results.append(result)
+
+        if any(result is None for result in results):
+            return None
+        if len(results) == 1:
+            return results[0]
+        return ([date for dates, _ in results for date in dates],
+                [value for _, values in results for value in values])
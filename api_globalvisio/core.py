@@ -1,14 +1,70 @@
 import pandas as pd
 import requests
+import gzip
+import hashlib
 import json
-import pytz
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
+from .auth import TokenProvider
+from .cache import HistoryCache
+from .coalesce import RequestCoalescer
+from .metrics import Metrics, metrics
+from .processing import ROLLUP_FREQS, HourlyState, aggregate_consumption, complete_buckets, consumption_rollups, \
+    counter_to_consumption, normalize_samples, records_to_lists, save_payloads, to_hourly
+from .records import SiteRecord, DeviceRecord, PointRecord, decode_json
+from .scheduler import CircuitBreaker, CircuitOpen, RequestScheduler, RateLimitExceeded
+from .store import SeriesStore
+from .transport import Transport, transport, configure_transport
+
 token_info = {
     'token': None,
     'expiration': None
 }
 
+# Cache local des historiques utilisé par défaut (voir set_history_cache)
+history_cache = None
+request_coalescer = RequestCoalescer()
+
+# Durées maximales des sous-requêtes acceptées par l'API
+MAX_HISTORY_WINDOW = timedelta(days=88)  # 3 mois maximum
+MAX_CONSUMPTION_WINDOW = timedelta(days=364)  # 1 an maximum
+# Nombre de relevés visé par réponse d'historique, et nombre de relevés par jour observé pour chaque point
+TARGET_WINDOW_SAMPLES = 15000
+sample_rates = {}
+# Fréquence de communication (en minutes) et dernière connexion des équipements déjà lus, par identifiant d'équipement
+communication_frequencies = {}
+last_connections = {}
+# Nouvelles tentatives des seules sous-requêtes en échec, et délai avant la première (doublé à chaque tentative)
+WINDOW_RETRIES = 2
+WINDOW_RETRY_DELAY = 1.0
+
+
+def _is_transient(response=None, error=None):
+    """
+    Indique si l'échec d'une requête est passager et mérite une nouvelle tentative:
+    erreur de connexion ou délai dépassé, réponse 5xx, ou 429 encore renvoyée après les tentatives du transport.
+    Un quota atteint (RateLimitExceeded) ou un disjoncteur ouvert (CircuitOpen) ne l'est pas.
+    """
+    if error is not None:
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return response is not None and (response.status_code >= 500 or response.status_code == 429)
+
+
+class HistoryWindowError(requests.RequestException):
+    """
+    Levée lorsqu'une sous-période d'historique reste en échec après les nouvelles tentatives.
+    point_id, start et end ('yyyy-mm-dd', fin exclue) identifient la sous-période à redemander.
+    """
+
+    def __init__(self, point_id, start, end):
+        super().__init__(f"Sous-période {start} - {end} de l'historique du point {point_id} non récupérée")
+        self.point_id = point_id
+        self.start = start
+        self.end = end
+
 
 class Credentials:
     def __init__(self):
@@ -17,6 +73,16 @@ class Credentials:
         self.remaining_day_requests = None
         self.api_key = None
 
+    @property
+    def api_key(self):
+        return self._api_key
+
+    @api_key.setter
+    def api_key(self, api_key):
+        # L'en-tête d'autorisation est porté par la session partagée du transport
+        self._api_key = api_key
+        transport.set_header('Authorization', f'Bearer {api_key}' if api_key else None)
+
     def set_credentials(self, identifiant, password):
         self.identifiant = identifiant
         self.password = password
@@ -28,102 +94,234 @@ class Credentials:
 credentials = Credentials()
 
 
-def check_user_exists():
+def set_history_cache(path):
+    """
+    Active le cache local des historiques dans la base SQLite `path`, ou le désactive si path vaut None.
+    Renvoie le cache utilisé.
+    """
+    global history_cache
+    if history_cache is not None:
+        history_cache.close()
+    history_cache = HistoryCache(path) if path else None
+    return history_cache
+
+
+def set_request_coalescing(enabled=True):
+    """
+    Active (par défaut) ou désactive le regroupement des sous-requêtes d'historique et de consommation
+    identiques ou chevauchantes émises en même temps par plusieurs threads.
+    Renvoie le RequestCoalescer utilisé, ou None.
+    """
+    global request_coalescer
+    request_coalescer = RequestCoalescer() if enabled else None
+    return request_coalescer
+
+
+def _split_period(start_date, end_date, max_diff):
+    """
+    Découpe la période [start_date, end_date) en sous-périodes contiguës d'au plus max_diff:
+    chaque sous-période commence à la fin (exclue) de la précédente.
+    Renvoie une liste de tuples (début, fin) au format 'yyyy-mm-dd'.
+    """
+    windows = []
+    while start_date < end_date:
+        # Calculer la fin de la période de sous-requête
+        sub_end_date = min(start_date + max_diff, end_date)
+        windows.append((start_date.strftime('%Y-%m-%d'), sub_end_date.strftime('%Y-%m-%d')))
+        # La sous-requête suivante commence à la fin de celle-ci
+        start_date = sub_end_date
+    return windows
+
+
+def history_window(point_id, frequence_communication=None):
+    """
+    Choisit la durée des sous-requêtes d'historique d'un point pour viser TARGET_WINDOW_SAMPLES relevés par réponse,
+    d'après le nombre de relevés par jour observé lors des réponses précédentes,
+    à défaut d'après la fréquence de communication de l'équipement (en minutes).
+    Les points peu denses utilisent des périodes longues (jusqu'à MAX_HISTORY_WINDOW), les points denses des périodes
+    plus courtes. Sans information, renvoie MAX_HISTORY_WINDOW.
+    """
+    rate = sample_rates.get(point_id)
+    if rate is None and frequence_communication:
+        try:
+            rate = 24 * 60 / float(frequence_communication)
+        except (TypeError, ValueError):
+            rate = None
+    if not rate:
+        return MAX_HISTORY_WINDOW
+    days = int(TARGET_WINDOW_SAMPLES // rate)
+    return timedelta(days=min(max(days, 1), MAX_HISTORY_WINDOW.days))
+
+
+def _authenticate():
     """
     Envoie une requête POST pour obtenir un token d'authentification.
-    Gère les erreurs de requête et vérifie l'expiration du token.
+    Renvoie un tuple (token, expiration, message d'erreur), token valant None en cas d'échec.
     """
 
-    url = 'https://global-visio.com/api/auth/token'
     payload = json.dumps({
         'username': credentials.identifiant,
         'password': credentials.password
     })
-    headers = {'Content-Type': 'application/json'}
 
     try:
-        response = requests.post(url, headers=headers, data=payload)
+        response = transport.post('auth/token', data=payload, headers={'Authorization': None})
         if 'X-RateLimit-Remaining' in response.headers:
             credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+        body = decode_json(response)
         if response.status_code != 200:
-            error_message = f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {response.json()['message']}"
-            print(error_message)
-            return False, error_message
+            error_message = f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {body['message']}"
+            return None, None, error_message
         response.raise_for_status()  # Gère les autres ERREURs HTTP
 
-        return True, ""
+        return body['response']['token'], datetime.fromisoformat(body['response']['expiration']), ""
 
     except requests.RequestException as e:
-        error_message = f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {e}"
+        return None, None, f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {e}"
+    except json.JSONDecodeError:
+        return None, None, 'ERREUR de décodage JSON. Vérifiez le format de la réponse.'
+    except KeyError:
+        return None, None, 'ERREUR dans la structure de données reçue. Vérifiez le format des données.'
+
+
+def _credentials_key():
+    """
+    Empreinte des identifiants courants, pour ne réutiliser un token que pour ces identifiants.
+    """
+    return hashlib.sha256(f'{credentials.identifiant}\0{credentials.password}'.encode('utf-8')).hexdigest()
+
+
+def _fetch_token():
+    token, expiration, error_message = _authenticate()
+    if token is None:
+        print(error_message)
+        return None
+    return token, expiration
+
+
+token_provider = TokenProvider(_fetch_token, token_info)
+
+
+def set_token_cache(path):
+    """
+    Enregistre le token dans le fichier `path` pour le réutiliser entre deux processus (None pour désactiver).
+    """
+    token_provider.cache_path = path
+
+
+def check_user_exists():
+    """
+    Vérifie les identifiants en obtenant un token d'authentification via une requête POST.
+    Si un token valide a déjà été obtenu pour ces identifiants, aucune requête n'est envoyée.
+    Renvoie un tuple (succès, message d'erreur).
+    """
+    key = _credentials_key()
+    if token_provider.current(key) is not None:
+        return True, ""
+
+    token, expiration, error_message = _authenticate()
+    if token is None:
         print(error_message)
         return False, error_message
 
+    # Le token obtenu est conservé pour les appels suivants à get_token
+    token_provider.set(token, expiration)
+    return True, ""
+
 
 def get_token():
     """
-    Envoie une requête POST pour obtenir un token d'authentification.
-    Gère les erreurs de requête et vérifie l'expiration du token.
+    Renvoie un token d'authentification valide, obtenu via une requête POST si nécessaire.
+    Le renouvellement est protégé par un verrou (un seul thread interroge l'API) et a lieu
+    en arrière-plan peu avant l'expiration du token.
     """
-    
-    paris_timezone = pytz.timezone("Europe/Paris")
-    current_time = datetime.now(paris_timezone)
+    return token_provider.get(_credentials_key())
 
-    # Vérifier si le token actuel est toujours valide
-    if token_info['token'] and token_info['expiration'] > current_time:
-        return token_info['token']
 
-    url = 'https://global-visio.com/api/auth/token'
-    payload = json.dumps({
-        'username': credentials.identifiant,
-        'password': credentials.password
-    })
-    headers = {'Content-Type': 'application/json'}
+def _fetch_sites_page(page, per_page):
+    """
+    Récupère une page de la liste des sites via une requête GET.
+    Renvoie le contenu de 'response' (liste 'sites' et éventuel nombre total de sites).
+    Lève requests.HTTPError si l'API renvoie une erreur.
+    """
+    path = f"sites/index?page={page}&perPage={per_page}"
 
-    try:
-        response = requests.post(url, headers=headers, data=payload)
-        if 'X-RateLimit-Remaining' in response.headers:
-            credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-        if response.status_code != 200:
-            print(
-                f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {response.json()['message']}")
-            return None
-        response.raise_for_status()  # Gère les autres ERREURs HTTP
-        token_info['token'] = response.json()['response']['token']
-        token_info['expiration'] = datetime.fromisoformat(response.json()['response']['expiration'])
+    response = transport.get(path)
+    if 'X-RateLimit-Remaining' in response.headers:
+        credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+    body = decode_json(response)
+    if response.status_code != 200:
+        raise requests.HTTPError(body['message'], response=response)
+    response.raise_for_status()
+    return body['response']
 
-        return token_info['token']
-    except requests.RequestException as e:
-        print(f"ERREUR lors de la requête d'authentification avec l'API de GlobalVisio: {e}")
-        return None
+
+def _total_pages(content, per_page):
+    """
+    Nombre total de pages d'après le contenu de la première page, ou None s'il n'est pas indiqué.
+    """
+    for key in ('totalPages', 'nbPages', 'pages'):
+        if isinstance(content.get(key), int):
+            return content[key]
+    for key in ('total', 'totalCount', 'count', 'nbTotal', 'nbResults'):
+        if isinstance(content.get(key), int):
+            return -(-content[key] // per_page)
+    return None
 
 
-def get_all_sites():
+def iter_site_pages(per_page=100, max_workers=4):
     """
-    Récupère tous les sites via une requête GET.
-    char est une liste de mots.
+    Générateur renvoyant les pages de la liste des sites sous forme de tuples (numéro de page, liste de sites),
+    dans l'ordre de leur réception.
+    Le nombre total de pages est lu sur la première page, puis les pages restantes sont récupérées en parallèle.
+    Si l'API n'indique pas ce total, les pages sont demandées par vagues de max_workers
+    jusqu'à obtenir une page incomplète.
+    Si l'API plafonne la taille des pages en dessous de per_page, la taille de la première page
+    est utilisée pour toutes les pages suivantes (si l'API indique le total, sans quoi une première page
+    incomplète est la seule page).
+    Lève requests.RequestException si une page ne peut pas être récupérée.
+    """
+    first = _fetch_sites_page(0, per_page)
+    sites = first['sites'] or []
+    yield 0, sites
+    if not sites:
+        return
+
+    # Taille réelle des pages: une première page incomplète peut venir d'un plafond de l'API
+    total_pages = _total_pages(first, min(per_page, len(sites)))
+    if total_pages is None and len(sites) < per_page:
+        return
+    if total_pages is not None and total_pages <= 1:
+        return
+    per_page = min(per_page, len(sites))
+    next_page = 1
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while total_pages is None or next_page < total_pages:
+            last_page = total_pages if total_pages is not None else next_page + max(1, max_workers)
+            futures = {executor.submit(_fetch_sites_page, page, per_page): page for page in range(next_page, last_page)}
+            next_page = last_page
+
+            complete = True
+            for future in as_completed(futures):
+                sites = future.result()['sites'] or []
+                complete = complete and len(sites) == per_page
+                yield futures[future], sites
+            if total_pages is None and not complete:
+                return
+
+
+def get_all_sites(per_page=100, max_workers=4):
+    """
+    Récupère tous les sites via des requêtes GET, toutes pages confondues.
     Gère les erreurs 404 et d'autres erreurs potentielles.
     """
-    
-
-    url = f"https://global-visio.com/api/sites/index?page=0&perPage=100"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
 
     try:
-        response = requests.get(url, headers=headers, data=payload)
-        if 'X-RateLimit-Remaining' in response.headers:
-            credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-        if response.status_code != 200:
-            print(
-                f"ERREUR lors de la requête des sites avec l'API de GlobalVisio: {response.json()['message']}")
-            return None
-        response.raise_for_status()
+        pages = dict(iter_site_pages(per_page, max_workers))
+        sites = [site for page in sorted(pages) for site in pages[page]]
 
-        if response.json()['response']['sites']:
-            data = pd.DataFrame(response.json()['response']['sites'])
+        if sites:
+            data = pd.DataFrame(sites)
 
             if len(data):
                 return data
@@ -151,77 +349,110 @@ def get_site_id_from_char(char):
     char est une liste de mots.
     Gère les erreurs 404 et d'autres erreurs potentielles.
     """
-    
 
-    url = f"https://global-visio.com/api/sites/index?page=0&perPage=100"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
+    data = get_all_sites()
+    if data is None:
+        return None
 
-    try:
-        response = requests.get(url, headers=headers, data=payload)
-        if 'X-RateLimit-Remaining' in response.headers:
-            credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-        if response.status_code != 200:
-            print(
-                f"ERREUR lors de la requête des sites avec l'API de GlobalVisio: {response.json()['message']}")
-            return None
-        response.raise_for_status()
+    # Utilisation d'une compréhension de liste pour vérifier la présence de tous les mots
+    # dans la colonne 'nom' pour chaque ligne
+    condition = data['nom'].apply(lambda x: all(word.lower() in x.lower() for word in char))
 
-        if response.json()['response']['sites']:
-            data = pd.DataFrame(response.json()['response']['sites'])
+    if condition.sum() > 1:
+        print(f"ERREUR lors de la requête du site car plusieurs sites possèdent ces caractères: {char}")
+        return None
+    elif condition.sum() == 1:
+        site_id = data[condition]['id'].astype(int).iloc[0]
+        return site_id
+    else:
+        print(f"ERREUR lors de la requête du site car aucun site ne possède ces caractères: {char}")
+        return None
 
-            # Utilisation d'une compréhension de liste pour vérifier la présence de tous les mots
-            # dans la colonne 'nom' pour chaque ligne
-            condition = data['nom'].apply(lambda x: all(word.lower() in x.lower() for word in char))
 
-            if condition.sum() > 1:
-                print(f"ERREUR lors de la requête du site car plusieurs sites possèdent ces caractères: {char}")
-                return None
-            elif condition.sum() == 1:
-                site_id = data[condition]['id'].astype(int).iloc[0]
-                return site_id
+class _LazyAttributes:
+    """
+    Attributs (_lazy_fields) chargés depuis l'API à leur première lecture, par la méthode load,
+    une seule fois même si plusieurs threads les lisent en même temps.
+    Un attribut déjà renseigné (par exemple depuis une ligne de liste) ne provoque aucune requête.
+    """
+    _lazy_fields = ()
+
+    def __getattr__(self, name):
+        # Appelé uniquement pour un attribut qui n'est pas encore renseigné
+        if name.startswith('_') or name not in type(self)._lazy_fields:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        with self._lazy_lock:
+            if name not in self.__dict__:
+                self.load()
+                # Les attributs que l'API n'a pas renseignés valent None, sans nouvelle requête
+                for field in self._lazy_fields:
+                    self.__dict__.setdefault(field, None)
+        return self.__dict__[name]
+
+    @classmethod
+    def load_many(cls, items, max_workers=8):
+        """
+        Construit plusieurs objets à partir d'une liste d'identifiants, dont les attributs sont chargés en parallèle
+        sur max_workers threads, ou de lignes de listes déjà téléchargées (DataFrame renvoyé par get_all_sites,
+        get_all_devices, get_all_points..., liste de dictionnaires ou de records), sans requête supplémentaire.
+        Renvoie la liste des objets dans l'ordre de items.
+        """
+        if isinstance(items, pd.DataFrame):
+            items = items.to_dict(orient='records')
+
+        objects, to_load = [], []
+        for item in items:
+            if isinstance(item, cls._record_class):
+                obj = cls(item.id)
+                obj.set_record(item)
+            elif isinstance(item, dict):
+                obj = cls(int(item['id']))
+                try:
+                    obj.set_record(cls._record_class.from_json(item))
+                except (KeyError, TypeError):
+                    # Ligne incomplète: les attributs seront chargés depuis l'API
+                    to_load.append(obj)
             else:
-                print(f"ERREUR lors de la requête du site car aucun site ne possède ces caractères: {char}")
-                return None
+                obj = cls(int(item))
+                to_load.append(obj)
+            objects.append(obj)
 
-        else:
-            print(
-                f"ERREUR lors de la requête des sites avec l'API de GlobalVisio: données inexistantes")
-            return None
-    except requests.RequestException as e:
-        print(f"ERREUR lors de la requête des sites avec l'API de GlobalVisio: {e}")
-        return None
-    except json.JSONDecodeError:
-        print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
-        return None
-    except KeyError:
-        print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
-        return None
+        if to_load:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                list(executor.map(lambda obj: getattr(obj, cls._lazy_fields[0]), to_load))
+        return objects
 
 
-class Site:
+class Site(_LazyAttributes):
     """
     Classe pour interagir avec un site de l'API de GlobalVisio.
+    Les attributs sont chargés à leur première lecture (voir Site.load_many pour en construire plusieurs).
     """
+    _lazy_fields = ('nom', 'adresse', 'adresse2', 'code_postal', 'ville', 'pays', 'start')
+    _record_class = SiteRecord
 
     def __init__(self, site_id):
         """
-        Initialisation de la classe avec les informations du site.
+        Initialisation de la classe avec l'identifiant du site.
         """
         self.id = site_id
-        self.nom = None
-        self.adresse = None
-        self.adresse2 = None
-        self.code_postal = None
-        self.ville = None
-        self.pays = None
-        self.start = None
+        self._lazy_lock = threading.Lock()
 
+    def load(self):
         self.get_site_attributes()
 
+    def set_record(self, record):
+        """
+        Renseigne les attributs du site à partir d'un SiteRecord.
+        """
+        self.nom = record.nom
+        self.adresse = record.adresse
+        self.adresse2 = record.adresse2
+        self.code_postal = record.code_postal
+        self.ville = record.ville
+        self.pays = record.pays
+        self.start = record.start
+
     def get_site_attributes(self):
         """
         Récupère les attributs d'un site spécifié via une requête GET.
@@ -229,32 +460,21 @@ class Site:
         """
         
 
-        url = f"https://global-visio.com/api/sites/index/{self.id}"
-        payload = {}
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {credentials.api_key}'
-        }
+        path = f"sites/index/{self.id}"
 
         try:
-            response = requests.get(url, headers=headers, data=payload)
+            response = transport.get(path)
             if 'X-RateLimit-Remaining' in response.headers:
                 credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            body = decode_json(response)
             if response.status_code != 200:
                 print(
-                    f"ERREUR lors de la requête d'attributs du site {self.id} avec l'API de GlobalVisio: {response.json()['message']}")
+                    f"ERREUR lors de la requête d'attributs du site {self.id} avec l'API de GlobalVisio: {body['message']}")
                 return None
             response.raise_for_status()
 
-            if response.json()['response']['site']:
-
-                self.nom = response.json()['response']['site']['nom']
-                self.adresse = response.json()['response']['site']['adresse']
-                self.adresse2 = response.json()['response']['site']['adresse2']
-                self.code_postal = response.json()['response']['site']['codePostal']
-                self.ville = response.json()['response']['site']['ville']
-                self.pays = response.json()['response']['site']['pays']
-                self.start = response.json()['response']['site']['start']
+            if body['response']['site']:
+                self.set_record(SiteRecord.from_json(body['response']['site']))
             else:
                 print(
                     f"ERREUR lors de la requête d'attributs du site {self.id} avec l'API de GlobalVisio: données inexistantes")
@@ -270,27 +490,42 @@ class Site:
             return None
 
 
-class Equipement:
+class Equipement(_LazyAttributes):
     """
     Classe pour interagir avec un équipement de l'API de GlobalVisio.
+    Les attributs sont chargés à leur première lecture (voir Equipement.load_many pour en construire plusieurs).
     """
+    _lazy_fields = ('site_id', 'mnemonique', 'nom', 'installation_debut', 'installation_fin', 'derniere_connexion',
+                    'frequence_communication', 'df_points')
+    _record_class = DeviceRecord
 
     def __init__(self, device_id):
         """
-        Initialisation de la classe avec les informations du site.
+        Initialisation de la classe avec l'identifiant de l'équipement.
         """
         self.id = device_id
-        self.site_id = None
-        self.mnemonique = None
-        self.nom = None
-        self.installation_debut = None
-        self.installation_fin = None
-        self.derniere_connexion = None
-        self.frequence_communication = None
-        self.df_points = None
+        self._lazy_lock = threading.Lock()
 
+    def load(self):
         self.get_device_attributes()
 
+    def set_record(self, record):
+        """
+        Renseigne les attributs de l'équipement à partir d'un DeviceRecord.
+        """
+        self.site_id = record.site_id
+        self.mnemonique = record.mnemonique
+        self.nom = record.nom
+        self.installation_debut = record.installation_debut
+        self.installation_fin = record.installation_fin
+        self.derniere_connexion = record.derniere_connexion
+        self.frequence_communication = record.frequence_communication
+        _remember_devices([{'id': self.id, 'frequenceCommunication': record.frequence_communication,
+                            'derniereConnexion': record.derniere_connexion}])
+        # Les lignes de /api/devices/listBySite ne contiennent pas les points: ils restent à charger
+        if record.points is not None:
+            self.df_points = pd.DataFrame(record.points)
+
     def get_device_attributes(self):
         """
         Récupère les attributs d'un site spécifié via une requête GET.
@@ -298,32 +533,21 @@ class Equipement:
         """
         
 
-        url = f"https://global-visio.com/api/devices/index/{self.id}"
-        payload = {}
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {credentials.api_key}'
-        }
+        path = f"devices/index/{self.id}"
 
         try:
-            response = requests.get(url, headers=headers, data=payload)
+            response = transport.get(path)
             if 'X-RateLimit-Remaining' in response.headers:
                 credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            body = decode_json(response)
             if response.status_code != 200:
                 print(
-                    f"ERREUR lors de la requête d'attributs de l'équipement {self.id} avec l'API de GlobalVisio: {response.json()['message']}")
+                    f"ERREUR lors de la requête d'attributs de l'équipement {self.id} avec l'API de GlobalVisio: {body['message']}")
                 return None
             response.raise_for_status()
 
-            if response.json()['response']['device']:
-                self.site_id = response.json()['response']['device']['site']['id']
-                self.mnemonique = response.json()['response']['device']['mnemonique']
-                self.nom = response.json()['response']['device']['nom']
-                self.installation_debut = response.json()['response']['device']['installationDebut']
-                self.installation_fin = response.json()['response']['device']['installationFin']
-                self.derniere_connexion = response.json()['response']['device']['derniereConnexion']
-                self.frequence_communication = response.json()['response']['device']['frequenceCommunication']
-                self.df_points = pd.DataFrame(response.json()['response']['device']['points'])
+            if body['response']['device']:
+                self.set_record(DeviceRecord.from_json(body['response']['device']))
             else:
                 print(
                     f"ERREUR lors de la requête d'attributs de l'équipement {self.id} avec l'API de GlobalVisio: données inexistantes")
@@ -339,25 +563,63 @@ class Equipement:
             return None
 
 
-class Point:
+class Point(_LazyAttributes):
     """
     Classe pour interagir avec un point de l'API de GlobalVisio.
+    Les attributs sont chargés à leur première lecture (voir Point.load_many pour en construire plusieurs).
     """
+    _lazy_fields = ('device_id', 'site_id', 'label_automate', 'label_humain', 'last_value', 'last_value_date', 'type',
+                    'subtype', 'unit')
+    _record_class = PointRecord
 
     def __init__(self, point_id):
         """
-        Initialisation de la classe avec les informations du site.
+        Initialisation de la classe avec l'identifiant du point.
         """
         self.id = point_id
-        self.device_id = None
-        self.site_id = None
-        self.label_automate = None
-        self.label_humain = None
-        self.last_value = None
-        self.last_value_date = None
-        self.type = None
-        self.subtype = None
-        self.unit = None
+        self._lazy_lock = threading.Lock()
+        # Sous-périodes dont la dernière requête a échoué de façon passagère (à retenter)
+        self._transient_windows = set()
+
+    @property
+    def frequence_communication(self):
+        """
+        Fréquence de communication de l'équipement du point (en minutes), utilisée pour dimensionner les sous-requêtes.
+        Seule une fréquence déjà connue est utilisée, sans aucune requête: celle des équipements déjà lus
+        (par Equipement, get_all_devices ou get_all_points_from_site), si l'équipement du point est déjà renseigné.
+        Renvoie None sinon.
+        """
+        frequency = self.__dict__.get('_frequence_communication')
+        if frequency is None and self.__dict__.get('device_id') is not None:
+            frequency = communication_frequencies.get(int(self.__dict__['device_id']))
+        return frequency
+
+    @frequence_communication.setter
+    def frequence_communication(self, value):
+        self._frequence_communication = value
+
+    def _last_connection(self):
+        """
+        Dernière connexion connue de l'équipement du point (datetime en heure de Paris), sans aucune requête,
+        ou None. Les jours qui s'achèvent après elle ne sont pas marqués comme complets dans le cache.
+        """
+        device_id = self.__dict__.get('device_id')
+        return last_connections.get(int(device_id)) if device_id is not None else None
+
+    def set_record(self, record):
+        """
+        Renseigne les attributs du point à partir d'un PointRecord.
+        Les champs vides du record ne remplacent pas les valeurs existantes.
+        """
+        self.device_id = record.device_id
+        self.site_id = record.site_id
+        for name in ('label_automate', 'label_humain', 'last_value', 'last_value_date', 'type', 'subtype', 'unit'):
+            value = getattr(record, name)
+            if value is not None or name not in self.__dict__:
+                setattr(self, name, value)
+
+    def load(self):
+        self.get_point_attributes()
 
     def get_point_attributes(self):
         """
@@ -366,40 +628,21 @@ class Point:
         """
         
 
-        url = f"https://global-visio.com/api/points/index/{self.id}"
-        payload = {}
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {credentials.api_key}'
-        }
+        path = f"points/index/{self.id}"
 
         try:
-            response = requests.get(url, headers=headers, data=payload)
+            response = transport.get(path)
             if 'X-RateLimit-Remaining' in response.headers:
                 credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            body = decode_json(response)
             if response.status_code != 200:
                 print(
-                    f"ERREUR lors de la requête d'attributs du point {self.id} avec l'API de GlobalVisio: {response.json()['message']}")
+                    f"ERREUR lors de la requête d'attributs du point {self.id} avec l'API de GlobalVisio: {body['message']}")
                 return None
             response.raise_for_status()
 
-            if response.json()['response']['point']:
-                self.device_id = response.json()['response']['point']['device']['id']
-                self.site_id = response.json()['response']['point']['device']['site']['id']
-                if response.json()['response']['point']['labelAutomate']:
-                    self.label_automate = response.json()['response']['point']['labelAutomate']
-                if response.json()['response']['point']['labelHumain']:
-                    self.label_humain = response.json()['response']['point']['labelHumain']
-                if response.json()['response']['point']['lastValue']:
-                    self.last_value = response.json()['response']['point']['lastValue']
-                if response.json()['response']['point']['lastValueDate']:
-                    self.last_value_date = response.json()['response']['point']['lastValueDate']
-                if response.json()['response']['point']['type']:
-                    self.type = response.json()['response']['point']['type']['nom']
-                if response.json()['response']['point']['subtype']:
-                    self.subtype = response.json()['response']['point']['subtype']['nom']
-                if response.json()['response']['point']['unit']:
-                    self.unit = response.json()['response']['point']['unit']['symbole']
+            if body['response']['point']:
+                self.set_record(PointRecord.from_json(body['response']['point']))
             else:
                 print(
                     f"ERREUR lors de la requête d'attributs du point {self.id} avec l'API de GlobalVisio: données inexistantes")
@@ -414,217 +657,441 @@ class Point:
             print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
             return None
 
-    def get_history(self, start, end, is_counter_index=True):
+    def _fetch_history_window(self, sub_start, sub_end):
+        """
+        Récupère une sous-période de l'historique d'un point, en reprenant les sous-requêtes identiques
+        ou chevauchantes déjà en cours dans d'autres threads (voir set_request_coalescing).
+        Renvoie un tuple (dates, valeurs) de listes brutes (vides si aucune donnée), ou None en cas d'erreur.
+        """
+        if request_coalescer is None:
+            return self._request_history_window(sub_start, sub_end)
+        return request_coalescer.fetch('history', self.id, sub_start, sub_end, self._request_history_window)
+
+    def _request_history_window(self, sub_start, sub_end):
+        """
+        Récupère une sous-période de l'historique d'un point via une requête GET.
+        Renvoie un tuple (dates, valeurs) de listes brutes (vides si aucune donnée), ou None en cas d'erreur.
+        Un échec passager (voir _is_transient) est noté dans _transient_windows pour être retenté.
+        """
+        path = f'points/history/{self.id}?dateStart={sub_start}&dateEnd={sub_end}'
+        self._transient_windows.discard((sub_start, sub_end))
+
+        try:
+            response = transport.get(path)
+            if _is_transient(response=response):
+                self._transient_windows.add((sub_start, sub_end))
+            if 'X-RateLimit-Remaining' in response.headers:
+                credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            body = decode_json(response)
+            if response.status_code != 200:
+                print(
+                    f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: {body['message']}")
+                return None
+            response.raise_for_status()
+
+            # Les dates et valeurs brutes sont normalisées une seule fois pour toutes les sous-requêtes
+            if body['response']['history']:
+                dates, values = records_to_lists(body['response']['history'])
+                # Densité observée, utilisée pour dimensionner les sous-requêtes suivantes
+                days = (datetime.strptime(sub_end, '%Y-%m-%d') - datetime.strptime(sub_start, '%Y-%m-%d')).days
+                if days > 0:
+                    sample_rates[self.id] = len(dates) / days
+                return dates, values
+            else:
+                print(
+                    f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: données inexistantes pour le point {self.id} entre {sub_start} et {sub_end}")
+                return [], []
+
+        except requests.RequestException as e:
+            if _is_transient(error=e):
+                self._transient_windows.add((sub_start, sub_end))
+            print(f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: {e}")
+            return None
+        except json.JSONDecodeError:
+            print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+            return None
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            return None
+
+    def _history_window(self):
+        """
+        Durée des sous-requêtes d'historique de ce point (voir history_window).
+        La fréquence de communication de l'équipement n'est lue que si aucune densité n'a encore été observée.
+        """
+        if self.id in sample_rates:
+            return history_window(self.id)
+        return history_window(self.id, self.frequence_communication)
+
+    def _fetch_windows(self, fetch, windows, max_workers=None, retries=None, partial=False, endpoint='history'):
+        """
+        Exécute fetch(sub_start, sub_end) pour chaque sous-période, en parallèle si max_workers > 1.
+        Seules les sous-périodes en échec sont redemandées, jusqu'à `retries` fois (WINDOW_RETRIES par défaut)
+        avec une attente exponentielle, et sans nouvelle tentative si le disjoncteur de l'endpoint ('history' ou
+        'consumption') est ouvert.
+        Seuls les échecs passagers sont retentés (erreur de connexion, délai dépassé, réponse 5xx ou 429,
+        voir _transient_windows); une erreur définitive (point inconnu, quota atteint, réponse mal formée) ne l'est pas.
+        Renvoie la liste des résultats dans l'ordre des sous-périodes, ou None si l'une d'elles a échoué;
+        avec partial=True, les sous-périodes en échec valent None dans la liste.
+        """
+        retries = WINDOW_RETRIES if retries is None else retries
+        results = [None] * len(windows)
+        pending = list(range(len(windows)))
+        attempt = 0
+        while pending:
+            if max_workers and max_workers > 1 and len(pending) > 1:
+                # map conserve l'ordre des fenêtres, donc l'ordre chronologique
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for i, sub_data in zip(pending, executor.map(lambda i: fetch(*windows[i]), pending)):
+                        results[i] = sub_data
+                fetched = set(pending)
+            else:
+                fetched = set()
+                for i in pending:
+                    results[i] = fetch(*windows[i])
+                    fetched.add(i)
+                    # Sans résultat partiel, inutile de poursuivre après un échec
+                    if results[i] is None and not partial:
+                        break
+
+            failed = [i for i in fetched if results[i] is None]
+            if not partial and any(windows[i] not in self._transient_windows for i in failed):
+                return None
+            # Restent à demander: les sous-périodes non encore demandées et celles en échec passager
+            pending = [i for i in pending if results[i] is None
+                       and (i not in fetched or windows[i] in self._transient_windows)]
+            if not pending or attempt >= retries or transport.breaker.state(endpoint) == 'open':
+                break
+            time.sleep(WINDOW_RETRY_DELAY * 2 ** attempt)
+            attempt += 1
+
+        if not partial and any(sub_data is None for sub_data in results):
+            return None
+        return results
+
+    def _get_windows_data(self, kind, fetch, start_date, end_date, max_diff, max_workers=None, cache=None,
+                          sort_values=True, partial=False):
+        """
+        Récupère les données d'une période découpée en sous-périodes d'au plus max_diff.
+        Les listes brutes de toutes les sous-requêtes sont normalisées en une seule passe vectorisée.
+        Avec un cache, seules les périodes non couvertes sont demandées à l'API,
+        puis les données sont relues depuis le cache; les sous-périodes reçues y sont conservées même si d'autres
+        ont échoué, de sorte qu'un nouvel appel ne redemande que les périodes manquantes.
+        Avec partial=True, les données des sous-périodes reçues sont renvoyées malgré les échecs,
+        et les périodes en échec sont listées dans data.attrs['failed_windows'] (tuples de dates 'yyyy-mm-dd').
+        Renvoie un DataFrame indexé par date (éventuellement vide), ou None en cas d'erreur.
+        """
+        cache = cache if cache is not None else history_cache
+        if cache is None:
+            periods = [(start_date, end_date)]
+        else:
+            periods = cache.missing_periods(kind, self.id, start_date, end_date)
+        windows = [window for sub_start, sub_end in periods for window in _split_period(sub_start, sub_end, max_diff)]
+
+        results = self._fetch_windows(fetch, windows, max_workers, partial=partial or cache is not None, endpoint=kind)
+        if results is None:
+            return None
+
+        failed = [window for window, sub_data in zip(windows, results) if sub_data is None]
+        received = [(window, sub_data) for window, sub_data in zip(windows, results) if sub_data is not None]
+        if failed:
+            print(f"ERREUR: sous-périodes non récupérées pour le point {self.id}: "
+                  f"{', '.join(f'{sub_start} - {sub_end}' for sub_start, sub_end in failed)}")
+
+        dates = [date for _, (sub_dates, _) in received for date in sub_dates]
+        values = [value for _, (_, sub_values) in received for value in sub_values]
+        data = normalize_samples(dates, values, sort_values)
+        if cache is not None:
+            cache.store(kind, self.id, [window for window, _ in received], data, until=self._last_connection())
+            if failed and not partial:
+                return None
+            data = cache.load(kind, self.id, start_date, end_date)
+
+        if partial:
+            data.attrs['failed_windows'] = failed
+        return data
+
+    def get_history(self, start, end, is_counter_index=True, max_workers=None, cache=None, rollover=None,
+                    store=None, partial=False):
         """
         Récupère l'historique horaire en kWh d'un point via des requêtes GET.
-        Gère les périodes de plus de 3 mois en divisant la requête en plusieurs sous-requêtes.
+        Gère les longues périodes en les divisant en sous-requêtes contiguës, d'au plus 3 mois,
+        dont la durée est adaptée à la densité des relevés du point (voir history_window).
+        Pour un index de compteur, l'index est interpolé aux heures piles et les remises à zéro sont ignorées;
+        rollover est la valeur maximale du compteur, au-delà de laquelle il repart de zéro.
+        Si un SeriesStore est fourni, l'historique horaire y est écrit et le store est renvoyé à la place du DataFrame.
+        Si max_workers est supérieur à 1, les sous-requêtes sont exécutées en parallèle.
+        Si un cache est fourni (ou activé via set_history_cache), seuls les jours absents du cache sont demandés.
+        Avec partial=True, l'historique des sous-périodes reçues est renvoyé même si d'autres ont échoué,
+        et les périodes en échec sont listées dans hourly.attrs['failed_windows']: un nouvel appel avec un cache
+        ne redemande qu'elles.
         Dates au format 'yyyy-mm-dd'.
         """
-        
 
         # Convertir les chaînes de dates en objets datetime
         start_date = datetime.strptime(start, '%Y-%m-%d')
         end_date = datetime.strptime(end, '%Y-%m-%d')
-        max_diff = timedelta(days=88)  # 3 mois maximum
-        data_frames = []  # Pour stocker les résultats de chaque sous-requête
-
-        while start_date < end_date:
-            # Calculer la fin de la période de sous-requête
-            sub_end_date = min(start_date + max_diff, end_date)
-            # Formater les dates pour l'URL
-            sub_start = start_date.strftime('%Y-%m-%d')
-            sub_end = sub_end_date.strftime('%Y-%m-%d')
-
-            url = f'https://global-visio.com/api/points/history/{self.id}?dateStart={sub_start}&dateEnd={sub_end}'
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {credentials.api_key}'
-            }
 
-            try:
-                response = requests.get(url, headers=headers)
-                if 'X-RateLimit-Remaining' in response.headers:
-                    credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-                if response.status_code != 200:
-                    print(
-                        f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: {response.json()['message']}")
-                    return None
-                response.raise_for_status()
-
-                # Traitement et stockage des données reçues
-                if response.json()['response']['history']:
-                    sub_data = pd.DataFrame(response.json()['response']['history'])
-                    sub_data = sub_data[['date', 'value']]
-                    sub_data['date'] = pd.to_datetime(sub_data['date'], utc=True)
-                    # sub_data = sub_data[sub_data['date'].dt.second == 0]
-                    sub_data = sub_data.sort_values(by=['date', 'value'], ascending=[True, True])
-                    sub_data['date'] = sub_data['date'].dt.tz_convert('Europe/Paris')
-                    sub_data.drop_duplicates(subset='date', keep='first', inplace=True)
-                    sub_data.set_index('date', inplace=True)
-                    # sub_data['unit'] = response.json()['response']['point']['unit']['symbole']
-                    data_frames.append(sub_data)
-                else:
-                    print(
-                        f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: données inexistantes pour le point {self.id} entre {sub_start} et {sub_end}")
-
-            except requests.RequestException as e:
-                print(f"ERREUR lors de la requête d'historique avec l'API de GlobalVisio: {e}")
-                return None
-            except json.JSONDecodeError:
-                print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
-                return None
-            except KeyError:
-                print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+        data = self._get_windows_data('history', self._fetch_history_window, start_date, end_date,
+                                      self._history_window(), max_workers, cache, partial=partial)
+        if data is None:
+            return None
+
+        hourly = to_hourly(data, is_counter_index, rollover=rollover)
+        if partial:
+            failed = data.attrs.get('failed_windows', [])
+            # Les heures des sous-périodes en échec ne sont pas interpolées à travers le trou
+            for sub_start, sub_end in failed:
+                lower = pd.Timestamp(sub_start).tz_localize('Europe/Paris')
+                upper = pd.Timestamp(sub_end).tz_localize('Europe/Paris')
+                hourly.loc[(hourly.index > lower) & (hourly.index <= upper), 'value'] = float('nan')
+            hourly.attrs['failed_windows'] = failed
+        if store is None:
+            return hourly
+        store.write(self.id, hourly)
+        return store
+
+    def iter_history(self, start, end, is_counter_index=True, prefetch=1, rollover=None):
+        """
+        Générateur renvoyant l'historique horaire d'un point sous-période par sous-période, dès réception.
+        Seuls le morceau courant et les `prefetch` sous-requêtes suivantes (lancées en arrière-plan) sont en mémoire.
+        Pour un index de compteur, le dernier relevé de chaque morceau est conservé
+        afin que les heures à cheval sur deux morceaux soient correctes.
+        Une sous-requête en échec est retentée comme dans get_history; si elle échoue encore,
+        lève HistoryWindowError (les morceaux déjà renvoyés sont complets, la suite peut être redemandée
+        à partir de son attribut start).
+        Dates au format 'yyyy-mm-dd'.
+        """
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+        windows = _split_period(start_date, end_date, self._history_window())
+        state = HourlyState()
+
+        def fetch(window):
+            results = self._fetch_windows(self._fetch_history_window, [window])
+            return None if results is None else results[0]
+
+        with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+            pending = [(window, executor.submit(fetch, window)) for window in windows[:prefetch + 1]]
+            next_window = len(pending)
+            while pending:
+                window, future = pending.pop(0)
+                result = future.result()
+                if result is None:
+                    for _, other in pending:
+                        other.cancel()
+                    raise HistoryWindowError(self.id, *window)
+                if next_window < len(windows):
+                    pending.append((windows[next_window], executor.submit(fetch, windows[next_window])))
+                    next_window += 1
+
+                hourly = to_hourly(normalize_samples(*result), is_counter_index, state, rollover)
+                if hourly is not None and not hourly.empty:
+                    yield hourly
+
+    def _fetch_consumption_window(self, sub_start, sub_end):
+        """
+        Récupère une sous-période de consommation journalière d'un point, en reprenant les sous-requêtes identiques
+        ou chevauchantes déjà en cours dans d'autres threads (voir set_request_coalescing).
+        Renvoie un tuple (dates, valeurs) de listes brutes (vides si aucune donnée), ou None en cas d'erreur.
+        """
+        if request_coalescer is None:
+            return self._request_consumption_window(sub_start, sub_end)
+        return request_coalescer.fetch('consumption', self.id, sub_start, sub_end, self._request_consumption_window)
+
+    def _request_consumption_window(self, sub_start, sub_end):
+        """
+        Récupère une sous-période de consommation journalière d'un point via une requête GET.
+        Renvoie un tuple (dates, valeurs) de listes brutes (vides si aucune donnée), ou None en cas d'erreur.
+        Un échec passager (voir _is_transient) est noté dans _transient_windows pour être retenté.
+        """
+        path = f'points/consumption/{self.id}?dateStart={sub_start}&dateEnd={sub_end}&period=2'
+        self._transient_windows.discard((sub_start, sub_end))
+
+        try:
+            response = transport.get(path)
+            if _is_transient(response=response):
+                self._transient_windows.add((sub_start, sub_end))
+            if 'X-RateLimit-Remaining' in response.headers:
+                credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            body = decode_json(response)
+            if response.status_code != 200:
+                print(
+                    f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: {body['message']}")
                 return None
+            response.raise_for_status()
 
-            # Préparer la date de début pour la prochaine sous-requête
-            start_date = sub_end_date + timedelta(days=1)
-
-        # Fusionner les résultats de toutes les sous-requêtes
-        if data_frames:
-            df_concat = pd.concat(data_frames)
-            # df_concat = df_concat[df_concat['value'] != 0.0]
-            # Si les valeurs sont un index
-            if df_concat['value'].is_monotonic_increasing and is_counter_index:
-                df_concat = df_concat[(df_concat.index.minute == 0) & (df_concat.index.second == 0)]
-                df_concat['value'] = df_concat.iloc[:, 0].diff()
-                if not df_concat.empty:
-                    df_concat.iloc[0, 0] = 0.0
-            # Si les valeurs sont des consommations horaires ou moins
+            # Les dates et valeurs brutes sont normalisées une seule fois pour toutes les sous-requêtes
+            if body['response']['consumption']:
+                return records_to_lists(body['response']['consumption'])
             else:
-                # unit = df_concat.iloc[0, 1]
-                df_concat = df_concat['value'].resample('h').mean().to_frame()
-                # df_concat['unit'] = unit
+                print(
+                    f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: données inexistantes pour le point {self.id} entre {sub_start} et {sub_end}")
+                return [], []
 
-            return df_concat
-        else:
+        except requests.RequestException as e:
+            if _is_transient(error=e):
+                self._transient_windows.add((sub_start, sub_end))
+            print(f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: {e}")
+            return None
+        except json.JSONDecodeError:
+            print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+            return None
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
             return None
 
-    def get_consumption_day(self, start, end):
+    def get_consumption_day(self, start, end, max_workers=None, cache=None, partial=False):
         """
         Récupère l'historique journalier en kWh d'un point via des requêtes GET.
         Gère les périodes de plus de 1 an en divisant la requête en plusieurs sous-requêtes.
+        Si un cache est fourni (ou activé via set_history_cache), seuls les jours absents du cache sont demandés.
+        Avec partial=True, les sous-périodes reçues sont renvoyées malgré les échecs (voir get_history).
         Dates au format 'yyyy-mm-dd'.
         """
-        
 
         # Convertir les chaînes de dates en objets datetime
         start_date = datetime.strptime(start, '%Y-%m-%d')
         end_date = datetime.strptime(end, '%Y-%m-%d')
-        max_diff = timedelta(days=364)  # 1 an maximum
-        data_frames = []  # Pour stocker les résultats de chaque sous-requête
-
-        while start_date < end_date:
-            # Calculer la fin de la période de sous-requête
-            sub_end_date = min(start_date + max_diff, end_date)
-            # Formater les dates pour l'URL
-            sub_start = start_date.strftime('%Y-%m-%d')
-            sub_end = sub_end_date.strftime('%Y-%m-%d')
-
-            url = f'https://global-visio.com/api/points/consumption/{self.id}?dateStart={sub_start}&dateEnd={sub_end}&period=2'
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {credentials.api_key}'
-            }
 
-            try:
-                response = requests.get(url, headers=headers)
-                if 'X-RateLimit-Remaining' in response.headers:
-                    credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-                if response.status_code != 200:
-                    print(
-                        f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: {response.json()['message']}")
-                    return None
-                response.raise_for_status()
-
-                # Traitement et stockage des données reçues
-                if response.json()['response']['consumption']:
-                    sub_data = pd.DataFrame(response.json()['response']['consumption'])
-                    sub_data = sub_data[['date', 'value']]
-                    # sub_data['unit'] = response.json()['response']['point']['unit']['symbole']
-                    sub_data['date'] = pd.to_datetime(sub_data['date'], utc=True)
-                    sub_data['date'] = sub_data['date'].dt.tz_convert('Europe/Paris')
-                    sub_data.drop_duplicates(subset='date', keep='first', inplace=True)
-                    sub_data.set_index('date', inplace=True)
-                    data_frames.append(sub_data)
-                else:
-                    print(
-                        f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: données inexistantes pour le point {self.id} entre {sub_start} et {sub_end}")
-
-            except requests.RequestException as e:
-                print(f"ERREUR lors de la requête de consommation journalière avec l'API de GlobalVisio: {e}")
-                return None
-            except json.JSONDecodeError:
-                print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+        data = self._get_windows_data('consumption', self._fetch_consumption_window, start_date, end_date,
+                                      MAX_CONSUMPTION_WINDOW, max_workers, cache, sort_values=False, partial=partial)
+
+        if data is not None and not data.empty:
+            return data
+        else:
+            return None
+
+    def get_consumption(self, start, end, freq='D', max_workers=None, cache=None, rollover=None):
+        """
+        Calcule localement, à partir de l'historique de l'index de compteur, la consommation d'un point
+        par quart d'heure ('15min'), heure ('h'), jour ('D'), semaine ('W', à partir du lundi) ou mois ('MS'),
+        sans requête de consommation supplémentaire.
+        Chaque valeur est datée par le début de son intervalle en heure de Paris.
+        Seuls les intervalles entièrement compris dans la période sont renvoyés: une semaine ou un mois
+        à cheval sur start ou end est omis.
+        Avec un cache (fourni ou activé via set_history_cache), les agrégats au quart d'heure, à l'heure et au jour
+        sont enregistrés à côté des relevés: un nouvel appel sur des jours déjà agrégés ne demande ni relevé ni calcul.
+        Dates au format 'yyyy-mm-dd', fin exclue.
+        """
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+        cache = cache if cache is not None else history_cache
+        stored_freq = freq if freq in ROLLUP_FREQS else 'D'
+
+        if cache is not None and not cache.missing_periods(f'rollup:{stored_freq}', self.id, start_date, end_date):
+            rollup = cache.load(f'rollup:{stored_freq}', self.id, start_date, end_date)
+        else:
+            # Un jour de relevés de part et d'autre permet d'interpoler l'index aux bornes de la période
+            data = self._get_windows_data('history', self._fetch_history_window, start_date - timedelta(days=1),
+                                          end_date + timedelta(days=1), self._history_window(), max_workers, cache)
+            if data is None:
                 return None
-            except KeyError:
-                print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            rollups = consumption_rollups(data, rollover)
+            if rollups is None:
                 return None
 
-            # Préparer la date de début pour la prochaine sous-requête
-            start_date = sub_end_date + timedelta(days=1)
+            lower = pd.Timestamp(start_date).tz_localize('Europe/Paris')
+            upper = pd.Timestamp(end_date).tz_localize('Europe/Paris')
+            rollups = {key: value[(value.index >= lower) & (value.index < upper)] for key, value in rollups.items()}
+            days = rollups[ROLLUP_FREQS[-1]].index
+            if cache is not None and len(days):
+                # Seuls les jours entièrement couverts par les relevés sont marqués comme calculés
+                window = (days[0].strftime('%Y-%m-%d'),
+                          (days[-1].tz_localize(None) + timedelta(days=1)).strftime('%Y-%m-%d'))
+                for key, value in rollups.items():
+                    cache.store(f'rollup:{key}', self.id, [window], value, until=self._last_connection())
+            rollup = rollups[stored_freq]
+
+        if freq == stored_freq:
+            return rollup
+        return complete_buckets(aggregate_consumption(rollup, freq), freq, start_date, end_date)
+
+    def _send_history_batch(self, payload, compress=False):
+        """
+        Envoie un lot d'historique via une requête POST.
+        Renvoie True si le lot a été enregistré, False sinon.
+        """
+        path = f"points/saveConsumption/{self.id}"
+        headers = None
+        if compress:
+            payload = gzip.compress(payload)
+            headers = {'Content-Encoding': 'gzip'}
+
+        try:
+            response = transport.post(path, data=payload, headers=headers)
+            if 'X-RateLimit-Remaining' in response.headers:
+                credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+            if response.status_code != 200:
+                print(
+                    f"ERREUR lors de la requête d'enregistrement de données sur le point {self.id} avec "
+                    f"l'API de GlobalVisio: {decode_json(response).get('message', '')}")
+            response.raise_for_status()
+            return True
 
-        # Fusionner les résultats de toutes les sous-requêtes
-        if data_frames:
-            df_concat = pd.concat(data_frames)
-            return df_concat
-        else:
-            return None
+        except requests.RequestException as e:
+            print(f"ERREUR lors de la requête d'enregistrement de données sur le point {self.id} avec "
+                  f"l'API de GlobalVisio: {e}")
+        except json.JSONDecodeError:
+            print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
+        except KeyError:
+            print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+        return False
 
-    def save_history(self, data):
+    def save_history(self, data, batch_size=5000, max_bytes=5 * 1024 * 1024, max_workers=4, retries=3,
+                     compress=False):
         """
         Enregistre l'historique d'un point virtuel dont le nom contient 'API' via des requêtes POST.
-        La fonction itère sur chaque ligne du dataframe `data` pour envoyer les valeurs historiques
-        avec les dates correspondantes.
+        Les valeurs du dataframe `data` (indexé par date, colonne 'value') sont réparties en lots
+        d'au plus batch_size lignes et max_bytes octets, envoyés en parallèle sur max_workers threads.
+        Seuls les lots en échec sont renvoyés, jusqu'à `retries` fois.
+        Si compress vaut True, le corps des requêtes est compressé en gzip.
+        Renvoie True si tous les lots ont été enregistrés, False sinon.
         """
         if ' API'.lower() in self.label_automate.lower() or ' API'.lower() in self.label_humain.lower():
 
-            url = f"https://global-visio.com/api/points/saveConsumption/{self.id}"
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {credentials.api_key}'
-            }
-
             # data['value'].replace(0, 0.0000000001, inplace=True)
 
-            data_list = []  # Liste pour stocker les dictionnaires avant la conversion en JSON
+            pending = save_payloads(data, batch_size, max_bytes)
 
-            for index, row in data.iterrows():
-                # Création du dictionnaire pour chaque ligne et ajout à la liste
-                data_list.append({
-                    "datetime": index.strftime('%Y-%m-%d %H:%M:%S'),  # Formatage de l'index datetime
-                    "value": row['value']  # Utilisation de la valeur de la colonne 'value'
-                })
+            for attempt in range(retries + 1):
+                if attempt:
+                    print(f"Nouvel envoi de {len(pending)} lot(s) en échec sur le point {self.id} "
+                          f"(tentative {attempt}/{retries})")
+                    time.sleep(min(30, 2 ** (attempt - 1)))
 
-            # Création de la charge utile JSON après la boucle
-            payload = json.dumps({
-                "modeSave": "history",
-                "data": data_list
-            })
+                with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                    sent = list(executor.map(lambda payload: self._send_history_batch(payload, compress), pending))
+                pending = [payload for payload, ok in zip(pending, sent) if not ok]
+                if not pending:
+                    return True
 
-            try:
-                response = requests.request("POST", url, headers=headers, data=payload)
-                if 'X-RateLimit-Remaining' in response.headers:
-                    credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
-                if response.status_code != 200:
-                    print(
-                        f"ERREUR lors de la requête d'enregistrement de données sur le point {self.id} avec "
-                        f"l'API de GlobalVisio: {response.json().get('message', '')}")
-                response.raise_for_status()
-
-            except requests.RequestException as e:
-                print(f"ERREUR lors de la requête d'enregistrement de données sur le point {self.id} avec "
-                      f"l'API de GlobalVisio: {e}")
-            except json.JSONDecodeError:
-                print('ERREUR de décodage JSON. Vérifiez le format de la réponse.')
-            except KeyError:
-                print('ERREUR dans la structure de données reçue. Vérifiez le format des données.')
+            print(f"ERREUR: {len(pending)} lot(s) n'ont pas pu être enregistrés sur le point {self.id}")
+            return False
         else:
             print(f'ERREUR: vous essayez de modifier la valeur d\'un point de l\'équipement non dédié '
                   f'à l\'API: {self.label_humain}')
             return None
 
 
+def _remember_devices(devices):
+    """
+    Retient la fréquence de communication et la dernière connexion des équipements d'une liste
+    (lignes de /api/devices/listBySite).
+    """
+    for device in devices:
+        if device.get('frequenceCommunication') is not None:
+            communication_frequencies[int(device['id'])] = device['frequenceCommunication']
+        if device.get('derniereConnexion'):
+            try:
+                connection = pd.Timestamp(device['derniereConnexion'])
+            except ValueError:
+                continue
+            if connection.tzinfo is not None:
+                connection = connection.tz_convert('Europe/Paris').tz_localize(None)
+            last_connections[int(device['id'])] = connection.to_pydatetime()
+
+
 def get_device_id_from_char(site_id, char):
     """
     Récupère la liste d'équipements dont le nom contient les caractères spécifiés via une requête GET.
@@ -633,25 +1100,22 @@ def get_device_id_from_char(site_id, char):
     """
     
 
-    url = f"https://global-visio.com/api/devices/listBySite/{site_id}"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
+    path = f"devices/listBySite/{site_id}"
 
     try:
-        response = requests.get(url, headers=headers, data=payload)
+        response = transport.get(path)
         if 'X-RateLimit-Remaining' in response.headers:
             credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+        body = decode_json(response)
         if response.status_code != 200:
             print(
-                f"ERREUR lors de la requête d'équipements du site {site_id} avec l'API de GlobalVisio: {response.json()['message']}")
+                f"ERREUR lors de la requête d'équipements du site {site_id} avec l'API de GlobalVisio: {body['message']}")
             return None
         response.raise_for_status()
 
-        if response.json()['response']['devices']:
-            data = pd.DataFrame(response.json()['response']['devices'])
+        if body['response']['devices']:
+            data = pd.DataFrame(body['response']['devices'])
+            _remember_devices(body['response']['devices'])
 
             # Utilisation d'une compréhension de liste pour vérifier la présence de tous les mots
             # dans la colonne 'labelHumain' pour chaque ligne
@@ -686,25 +1150,22 @@ def get_all_devices(site_id):
     """
     
 
-    url = f"https://global-visio.com/api/devices/listBySite/{site_id}"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
+    path = f"devices/listBySite/{site_id}"
 
     try:
-        response = requests.get(url, headers=headers, data=payload)
+        response = transport.get(path)
         if 'X-RateLimit-Remaining' in response.headers:
             credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+        body = decode_json(response)
         if response.status_code != 200:
             print(
-                f"ERREUR lors de la requête d'équipements du site {site_id} avec l'API de GlobalVisio: {response.json()['message']}")
+                f"ERREUR lors de la requête d'équipements du site {site_id} avec l'API de GlobalVisio: {body['message']}")
             return None
         response.raise_for_status()
 
-        if response.json()['response']['devices']:
-            data = pd.DataFrame(response.json()['response']['devices'])
+        if body['response']['devices']:
+            data = pd.DataFrame(body['response']['devices'])
+            _remember_devices(body['response']['devices'])
 
             if len(data):
                 return data
@@ -735,25 +1196,21 @@ def get_points_id_from_char(device_id, char):
     """
     
 
-    url = f"https://global-visio.com/api/devices/index/{device_id}"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
+    path = f"devices/index/{device_id}"
 
     try:
-        response = requests.get(url, headers=headers, data=payload)
+        response = transport.get(path)
         if 'X-RateLimit-Remaining' in response.headers:
             credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+        body = decode_json(response)
         if response.status_code != 200:
             print(
-                f"ERREUR lors de la requête de points de l'équipement {device_id} avec l'API de GlobalVisio: {response.json()['message']}")
+                f"ERREUR lors de la requête de points de l'équipement {device_id} avec l'API de GlobalVisio: {body['message']}")
             return None
         response.raise_for_status()
 
-        if response.json()['response']['device']:
-            data = pd.DataFrame(response.json()['response']['device']['points'])
+        if body['response']['device']:
+            data = pd.DataFrame(body['response']['device']['points'])
 
             # Utilisation d'une compréhension de liste pour vérifier la présence de tous les mots
             # dans la colonne 'labelHumain' pour chaque ligne
@@ -785,25 +1242,21 @@ def get_all_points(device_id):
     """
     
 
-    url = f"https://global-visio.com/api/devices/index/{device_id}"
-    payload = {}
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {credentials.api_key}'
-    }
+    path = f"devices/index/{device_id}"
 
     try:
-        response = requests.get(url, headers=headers, data=payload)
+        response = transport.get(path)
         if 'X-RateLimit-Remaining' in response.headers:
             credentials.remaining_day_requests = response.headers['X-RateLimit-Remaining']
+        body = decode_json(response)
         if response.status_code != 200:
             print(
-                f"ERREUR lors de la requête de points de l'équipement {device_id} avec l'API de GlobalVisio: {response.json()['message']}")
+                f"ERREUR lors de la requête de points de l'équipement {device_id} avec l'API de GlobalVisio: {body['message']}")
             return None
         response.raise_for_status()
 
-        if response.json()['response']['device']:
-            data = pd.DataFrame(response.json()['response']['device']['points'])
+        if body['response']['device']:
+            data = pd.DataFrame(body['response']['device']['points'])
 
             if len(data):
                 return data
@@ -827,29 +1280,108 @@ def get_all_points(device_id):
         return None
 
 
-def get_all_points_from_site(site_id):
-    data_devices = get_all_devices(site_id)
+def get_all_points_from_site(site_id, max_workers=8, return_failures=False):
+    """
+    Récupère tous les points des équipements d'un site, ou de plusieurs sites si site_id est une liste.
+    Les équipements sont interrogés en parallèle sur max_workers threads, et chaque ligne est complétée
+    par les colonnes 'site_id' et 'device_id'.
+    Un site ou un équipement en échec est signalé sans interrompre la récupération des autres.
+    Si return_failures vaut True, renvoie un tuple (DataFrame, échecs) où échecs est un dictionnaire
+    {'sites': [...], 'devices': [...]} des identifiants en échec.
+    """
+    site_ids = list(site_id) if isinstance(site_id, (list, tuple, set)) else [site_id]
+    failures = {'sites': [], 'devices': []}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        devices_by_site = dict(zip(site_ids, executor.map(get_all_devices, site_ids)))
 
-    if data_devices is not None:
+        tasks = []
+        for current_site_id, data_devices in devices_by_site.items():
+            if data_devices is None:
+                failures['sites'].append(current_site_id)
+                continue
+            tasks.extend((current_site_id, device_id) for device_id in data_devices['id'].tolist())
 
-        list_devices_id = data_devices['id'].tolist()
+        results = executor.map(lambda task: get_all_points(task[1]), tasks)
 
         # Initialiser une liste vide pour stocker tous les DataFrame de chaque appareil
         all_data_points = []
+        for (current_site_id, device_id), data_points in zip(tasks, results):
+            if data_points is None:
+                failures['devices'].append(device_id)
+                continue
+            # Ajouter le DataFrame à la liste, avec l'équipement et le site d'origine
+            all_data_points.append(data_points.assign(site_id=current_site_id, device_id=device_id))
 
-        for device_id in list_devices_id:
-            data_points = get_all_points(device_id)
-            # Ajouter le DataFrame à la liste
-            all_data_points.append(data_points)
-
-        # Concaténer tous les DataFrame dans un seul DataFrame
-        combined_data_points = pd.concat(all_data_points, ignore_index=True)
+    if failures['sites'] or failures['devices']:
+        print(f"ERREUR lors de la récupération des points: sites en échec {failures['sites']}, "
+              f"équipements en échec {failures['devices']}")
 
-        return combined_data_points
+    # Concaténer tous les DataFrame dans un seul DataFrame
+    combined_data_points = pd.concat(all_data_points, ignore_index=True) if all_data_points else None
 
-    else:
-        return None
+    if return_failures:
+        return combined_data_points, failures
+    return combined_data_points
 
 
+def get_histories(point_ids, start, end, is_counter_index=True, max_workers=8, wide=True, store=None):
+    """
+    Récupère l'historique horaire de plusieurs points en une seule fois.
+    Toutes les sous-requêtes (point, sous-période) sont réparties sur un même pool de threads,
+    puis chaque point est post-traité comme dans Point.get_history.
+    Si wide vaut True, renvoie un DataFrame avec une colonne par point sur un index horaire commun,
+    sinon un DataFrame long avec les colonnes 'point_id', 'date' et 'value'.
+    Si un SeriesStore est fourni, l'historique de chaque point y est écrit dès qu'il est traité
+    et le store est renvoyé, sans construire de DataFrame commun.
+    Dates au format 'yyyy-mm-dd'.
+    """
+    start_date = datetime.strptime(start, '%Y-%m-%d')
+    end_date = datetime.strptime(end, '%Y-%m-%d')
+
+    points = [Point(point_id) for point_id in point_ids]
+    # Chaque point a ses propres sous-périodes, dimensionnées selon sa densité
+    point_windows = [_split_period(start_date, end_date, point._history_window()) for point in points]
+    tasks = [(point, sub_start, sub_end)
+             for point, windows in zip(points, point_windows) for sub_start, sub_end in windows]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or 1)) as executor:
+        results = list(executor.map(lambda task: task[0]._fetch_history_window(task[1], task[2]), tasks))
+
+    # Regrouper les sous-périodes par point, dans l'ordre chronologique
+    histories = {}
+    end_task = 0
+    for point, windows in zip(points, point_windows):
+        start_task, end_task = end_task, end_task + len(windows)
+        point_results = results[start_task:end_task]
+        if any(sub_data is None for sub_data in point_results):
+            print(f"ERREUR lors de la requête d'historique du point {point.id}: point ignoré")
+            continue
+        dates = [date for sub_dates, _ in point_results for date in sub_dates]
+        values = [value for _, sub_values in point_results for value in sub_values]
+        history = to_hourly(normalize_samples(dates, values), is_counter_index)
+        # Les réponses brutes du point ne sont plus nécessaires
+        results[start_task:end_task] = [None] * len(windows)
+        if history is None:
+            continue
+        if store is not None:
+            store.write(point.id, history)
+        else:
+            histories[point.id] = history['value']
 
+    if store is not None:
+        return store
+    if not histories:
+        return None
 
+    if wide:
+        data = pd.DataFrame(histories)
+        data = data.reindex(pd.date_range(data.index.min(), data.index.max(), freq='h'))
+        data.index.name = 'date'
+        return data
+
+    return pd.concat(
+        [series.rename('value').rename_axis('date').reset_index().assign(point_id=point_id)
+         for point_id, series in histories.items()],
+        ignore_index=True
+    )[['point_id', 'date', 'value']]
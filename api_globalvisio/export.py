@@ -0,0 +1,266 @@
+"""
+Export en masse des historiques de points vers des fichiers Parquet ou CSV, un fichier par point et par mois:
+
+    <sortie>/point_id=<id>/<yyyy-mm>.parquet
+
+Les exports interrompus reprennent là où ils se sont arrêtés grâce au journal <sortie>/.export-journal.jsonl,
+qui enregistre chaque fichier terminé.
+
+Exemple:
+    globalvisio-export --site-name Lycée Hugo --point-name Compteur --start 2020-01-01 --end 2024-01-01 \
+        --output exports --format parquet --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from . import core
+from .catalog import Catalog, _match_words
+from .processing import to_hourly
+
+JOURNAL_NAME = '.export-journal.jsonl'
+
+
+def month_periods(start_date, end_date):
+    """
+    Découpe [start_date, end_date) en mois calendaires.
+    Renvoie une liste de tuples (mois 'yyyy-mm', début, fin exclue) au format datetime.
+    """
+    periods = []
+    current = start_date
+    while current < end_date:
+        next_month = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+        periods.append((current.strftime('%Y-%m'), current, min(next_month, end_date)))
+        current = next_month
+    return periods
+
+
+class ExportJournal:
+    """
+    Journal des fichiers d'export terminés (une ligne JSON par point, mois, type de données et format).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par une interruption
+                        continue
+                    self.done.add((int(entry['point_id']), entry['month'], entry.get('kind'), entry.get('format')))
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def record(self, point_id, month, kind, file_format, rows, file_path):
+        entry = {'point_id': int(point_id), 'month': month, 'kind': kind, 'format': file_format, 'rows': int(rows),
+                 'file': file_path}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            self.done.add((int(point_id), month, kind, file_format))
+
+
+def resolve_points(catalog, sites=(), site_name=None, devices=(), device_name=None, points=(), point_name=None):
+    """
+    Renvoie la liste triée des identifiants de points à exporter:
+    les points donnés, et les points des équipements donnés ou trouvés dans les sites (par identifiant ou par nom),
+    filtrés par les mots de device_name et point_name.
+    """
+    point_ids = set(int(point_id) for point_id in points)
+
+    site_ids = [int(site_id) for site_id in sites]
+    if site_name:
+        site_id = catalog.get_site_id_from_char(site_name)
+        if site_id is not None:
+            site_ids.append(int(site_id))
+
+    device_ids = [int(device_id) for device_id in devices]
+    for site_id in site_ids:
+        if device_name:
+            device_ids.extend(catalog.get_device_id_from_char(site_id, device_name) or [])
+        else:
+            data = catalog.get_all_devices(site_id)
+            if data is not None:
+                device_ids.extend(data['id'].astype(int).tolist())
+
+    for device_id in sorted(set(device_ids)):
+        data = catalog.get_all_points(device_id)
+        if data is None:
+            continue
+        if point_name:
+            data = data[_match_words(data['labelHumain'], point_name)]
+        point_ids.update(data['id'].astype(int).tolist())
+
+    return sorted(point_ids)
+
+
+def fetch_month(point_id, start_date, end_date, kind='hourly'):
+    """
+    Récupère les données d'un point sur [start_date, end_date).
+    kind='hourly': historique horaire de Point.get_history (consommation d'un index ou moyenne horaire),
+    calculé avec un jour de relevés supplémentaire afin que la première heure du mois soit correcte;
+    kind='raw': relevés normalisés tels que renvoyés par l'API.
+    Renvoie un DataFrame (éventuellement vide) ou None en cas d'erreur.
+    """
+    point = core.Point(point_id)
+    fetch_start = start_date - timedelta(days=1) if kind == 'hourly' else start_date
+    data = point._get_windows_data('history', point._fetch_history_window, fetch_start, end_date,
+                                   point._history_window())
+    if data is None:
+        return None
+    if kind == 'hourly' and not data.empty:
+        data = to_hourly(data)
+
+    lower = pd.Timestamp(start_date).tz_localize('Europe/Paris')
+    upper = pd.Timestamp(end_date).tz_localize('Europe/Paris')
+    return data[(data.index >= lower) & (data.index < upper)]
+
+
+def write_month(data, output, point_id, month, file_format):
+    """
+    Écrit les données d'un point et d'un mois dans <output>/point_id=<id>/<month>.<format>
+    (via un fichier temporaire, pour ne jamais laisser de fichier partiel). Renvoie le chemin du fichier.
+    """
+    directory = os.path.join(output, f'point_id={point_id}')
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f'{month}.{file_format}')
+    temporary_path = f'{file_path}.tmp'
+    if file_format == 'parquet':
+        data.to_parquet(temporary_path)
+    else:
+        data.to_csv(temporary_path)
+    os.replace(temporary_path, file_path)
+    return file_path
+
+
+def export(point_ids, start, end, output, file_format='parquet', kind='hourly', max_workers=8, progress=True):
+    """
+    Exporte les historiques des points sur [start, end) (dates 'yyyy-mm-dd'), un fichier par point et par mois,
+    en parallèle sur max_workers threads. Les couples point/mois déjà présents dans le journal sont ignorés;
+    seuls les mois écoulés y sont inscrits.
+    Renvoie un dictionnaire {'done', 'skipped', 'empty', 'failed': [(point_id, mois), ...]}.
+    """
+    os.makedirs(output, exist_ok=True)
+    journal = ExportJournal(os.path.join(output, JOURNAL_NAME))
+    periods = month_periods(datetime.strptime(start, '%Y-%m-%d'), datetime.strptime(end, '%Y-%m-%d'))
+    tasks = [(point_id, month, month_start, month_end)
+             for point_id in point_ids for month, month_start, month_end in periods]
+    pending = [task for task in tasks if (task[0], task[1], kind, file_format) not in journal]
+    summary = {'done': 0, 'skipped': len(tasks) - len(pending), 'empty': 0, 'failed': []}
+
+    # Un mois qui n'est pas encore écoulé est exporté mais pas journalisé, pour être complété à la prochaine exécution
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    def run(task):
+        point_id, month, month_start, month_end = task
+        data = fetch_month(point_id, month_start, month_end, kind)
+        if data is None:
+            return None
+        if data.empty:
+            if month_end <= today:
+                journal.record(point_id, month, kind, file_format, 0, None)
+            return 0
+        try:
+            write_month(data, output, point_id, month, file_format)
+        except (OSError, ImportError, ValueError) as e:
+            print(f"ERREUR lors de l'écriture de l'export du point {point_id} pour {month}: {e}")
+            return None
+        if month_end <= today:
+            journal.record(point_id, month, kind, file_format, len(data), f'point_id={point_id}/{month}.{file_format}')
+        return len(data)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(run, task): task for task in pending}
+        for count, future in enumerate(as_completed(futures), 1):
+            point_id, month = futures[future][:2]
+            rows = future.result()
+            if rows is None:
+                summary['failed'].append((point_id, month))
+            elif rows == 0:
+                summary['empty'] += 1
+            else:
+                summary['done'] += 1
+            if progress:
+                print(f'[{count}/{len(pending)}] point {point_id} {month}: '
+                      f'{"échec" if rows is None else f"{rows} lignes"}', file=sys.stderr)
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='globalvisio-export',
+        description="Export parallèle et reprenable des historiques de points GlobalVisio en Parquet ou CSV.")
+    parser.add_argument('--start', required=True, help="date de début 'yyyy-mm-dd' (incluse)")
+    parser.add_argument('--end', required=True, help="date de fin 'yyyy-mm-dd' (exclue)")
+    parser.add_argument('--output', required=True, help='répertoire de sortie')
+    parser.add_argument('--sites', nargs='*', default=[], type=int, help='identifiants de sites')
+    parser.add_argument('--site-name', nargs='*', default=None, help='mots contenus dans le nom du site')
+    parser.add_argument('--devices', nargs='*', default=[], type=int, help="identifiants d'équipements")
+    parser.add_argument('--device-name', nargs='*', default=None, help="mots contenus dans le nom des équipements")
+    parser.add_argument('--points', nargs='*', default=[], type=int, help='identifiants de points')
+    parser.add_argument('--point-name', nargs='*', default=None, help='mots contenus dans le libellé des points')
+    parser.add_argument('--format', choices=('parquet', 'csv'), default='parquet', dest='file_format')
+    parser.add_argument('--kind', choices=('hourly', 'raw'), default='hourly',
+                        help='historique horaire (par défaut) ou relevés bruts')
+    parser.add_argument('--workers', type=int, default=8, help='nombre de téléchargements simultanés')
+    parser.add_argument('--api-key', default=os.environ.get('GLOBALVISIO_API_KEY'))
+    parser.add_argument('--username', default=os.environ.get('GLOBALVISIO_USERNAME'))
+    parser.add_argument('--password', default=os.environ.get('GLOBALVISIO_PASSWORD'))
+    parser.add_argument('--base-url', default=None, help="URL de l'API (par défaut celle de GlobalVisio)")
+    parser.add_argument('--quiet', action='store_true', help="n'affiche pas la progression")
+    return parser
+
+
+def main(argv=None):
+    """
+    Point d'entrée de la commande globalvisio-export. Renvoie le code de sortie.
+    """
+    args = build_parser().parse_args(argv)
+    if args.base_url:
+        core.configure_transport(base_url=args.base_url)
+    if args.username or args.password:
+        core.credentials.set_credentials(args.username, args.password)
+    if args.api_key:
+        core.credentials.set_api_key(args.api_key)
+
+    if args.file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("ERREUR: l'export Parquet nécessite pyarrow (pip install api_globalvisio[parquet]), "
+                  "ou utilisez --format csv")
+            return 2
+
+    catalog = Catalog(ttl=None)
+    point_ids = resolve_points(catalog, args.sites, args.site_name, args.devices, args.device_name, args.points,
+                               args.point_name)
+    if not point_ids:
+        print('ERREUR: aucun point à exporter')
+        return 2
+
+    summary = export(point_ids, args.start, args.end, args.output, args.file_format, args.kind, args.workers,
+                     progress=not args.quiet)
+    print(f"{len(point_ids)} points: {summary['done']} fichiers écrits, {summary['empty']} mois sans donnée, "
+          f"{summary['skipped']} déjà exportés, {len(summary['failed'])} échecs")
+    if summary['failed']:
+        print('Relancez la même commande pour réessayer les mois en échec.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import threading
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def endpoint_name(path):
+    """
+    Nom de l'endpoint d'un chemin de l'API (auth, sites, devices, points, history, consumption, saveConsumption).
+    """
+    parts = path.split('?', 1)[0].strip('/').split('/')
+    if parts and parts[0] == 'api':
+        parts = parts[1:]
+    if not parts or not parts[0]:
+        return 'other'
+    if parts[0] == 'points' and len(parts) > 1 and parts[1] in ('history', 'consumption', 'saveConsumption'):
+        return parts[1]
+    if parts[0] in ('auth', 'sites', 'devices', 'points'):
+        return parts[0]
+    return 'other'
+
+
+class EndpointStats:
+    """
+    Compteurs d'un endpoint.
+    """
+    __slots__ = ('requests', 'errors', 'retries', 'bytes_received', 'latency_sum', 'latency_buckets',
+                 'status_codes', 'rate_limit_consumed')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.status_codes = {}
+        self.rate_limit_consumed = 0
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.latency_buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes_received': self.bytes_received,
+            'latency_sum': self.latency_sum,
+            'latency_mean': self.latency_sum / self.requests if self.requests else None,
+            'latency_buckets': buckets,
+            'status_codes': dict(self.status_codes),
+            'rate_limit_consumed': self.rate_limit_consumed,
+        }
+
+
+class Metrics:
+    """
+    Instrumentation des requêtes envoyées à GlobalVisio, par endpoint:
+    nombre de requêtes, histogramme des latences, octets reçus, nouvelles tentatives, erreurs
+    et consommation du quota (d'après X-RateLimit-Remaining).
+    Des fonctions de rappel peuvent être ajoutées avec add_hook: elles reçoivent un dictionnaire
+    décrivant chaque requête terminée.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._hooks = []
+        self.rate_limit_remaining = None
+
+    def add_hook(self, hook):
+        """
+        Ajoute une fonction appelée après chaque requête avec un dictionnaire
+        {'endpoint', 'method', 'status', 'latency', 'bytes', 'retry', 'error'}.
+        """
+        self._hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.rate_limit_remaining = None
+
+    def record(self, path, method='GET', status=None, latency=0.0, size=0, retry=False, error=None,
+               rate_limit_remaining=None):
+        """
+        Enregistre une requête terminée (ou en échec si error est renseigné).
+        """
+        endpoint = endpoint_name(path)
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.latency_sum += latency
+            stats.bytes_received += size
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+            stats.latency_buckets[bucket] += 1
+            if retry:
+                stats.retries += 1
+            if error is not None or (status is not None and status >= 400):
+                stats.errors += 1
+            if status is not None:
+                stats.status_codes[status] = stats.status_codes.get(status, 0) + 1
+
+            if rate_limit_remaining is not None:
+                try:
+                    remaining = int(rate_limit_remaining)
+                except ValueError:
+                    remaining = None
+                if remaining is not None:
+                    if self.rate_limit_remaining is not None and remaining < self.rate_limit_remaining:
+                        stats.rate_limit_consumed += self.rate_limit_remaining - remaining
+                    self.rate_limit_remaining = remaining
+
+        if self._hooks:
+            event = {'endpoint': endpoint, 'method': method, 'status': status, 'latency': latency, 'bytes': size,
+                     'retry': retry, 'error': error}
+            for hook in list(self._hooks):
+                try:
+                    hook(event)
+                except Exception as e:
+                    print(f"ERREUR dans une fonction de rappel des métriques: {e}")
+
+    def to_dict(self):
+        """
+        Exporte les métriques sous forme de dictionnaire {endpoint: {...}}.
+        """
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in self._stats.items()}
+
+    def to_prometheus(self, prefix='globalvisio'):
+        """
+        Exporte les métriques au format texte de Prometheus.
+        """
+        lines = []
+        with self._lock:
+            stats_items = sorted(self._stats.items())
+            remaining = self.rate_limit_remaining
+
+            counters = (
+                ('requests_total', 'Nombre de requêtes', 'requests'),
+                ('errors_total', 'Nombre de requêtes en erreur', 'errors'),
+                ('retries_total', 'Nombre de nouvelles tentatives', 'retries'),
+                ('received_bytes_total', 'Octets reçus', 'bytes_received'),
+                ('rate_limit_consumed_total', 'Requêtes décomptées du quota', 'rate_limit_consumed'),
+            )
+            for name, description, attribute in counters:
+                lines.append(f'# HELP {prefix}_{name} {description}')
+                lines.append(f'# TYPE {prefix}_{name} counter')
+                for endpoint, stats in stats_items:
+                    lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {getattr(stats, attribute)}')
+
+            lines.append(f'# HELP {prefix}_request_duration_seconds Durée des requêtes')
+            lines.append(f'# TYPE {prefix}_request_duration_seconds histogram')
+            for endpoint, stats in stats_items:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.latency_buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} '
+                                 f'{cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.latency_sum}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.requests}')
+
+        if remaining is not None:
+            lines.append(f'# HELP {prefix}_rate_limit_remaining Quota de requêtes restant')
+            lines.append(f'# TYPE {prefix}_rate_limit_remaining gauge')
+            lines.append(f'{prefix}_rate_limit_remaining {remaining}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+
+
+def empty_samples():
+    """
+    DataFrame vide au format des historiques normalisés.
+    """
+    index = pd.DatetimeIndex([], tz='Europe/Paris', name='date')
+    return pd.DataFrame({'value': np.array([], dtype=float)}, index=index)
+
+
+def records_to_lists(records):
+    """
+    Extrait les listes de dates et de valeurs d'une liste d'enregistrements {'date': ..., 'value': ...}.
+    Lève KeyError si un enregistrement ne contient pas ces clés.
+    """
+    return [record['date'] for record in records], [record['value'] for record in records]
+
+
+def parse_dates(dates):
+    """
+    Convertit des dates ISO 8601 en DatetimeIndex UTC.
+    Les dates au format fixe 'yyyy-mm-ddTHH:MM:SS' suivi de '+HH:MM', '-HH:MM', 'Z' ou de rien (UTC)
+    sont décodées directement par NumPy à partir des codes de caractères;
+    les autres formats passent par pd.to_datetime.
+    """
+    values = np.asarray(dates)
+    if values.dtype.kind == 'U' and values.ndim == 1 and len(values):
+        width = values.dtype.itemsize // 4
+        codes = values.view(np.uint32).reshape(len(values), width)
+        # Toutes les chaînes doivent avoir la même longueur pour utiliser le format fixe
+        if width in (19, 20, 25) and bool(np.all(codes[:, -1] != 0)):
+            try:
+                local = values.astype('U19').astype('datetime64[s]')
+            except ValueError:
+                local = None
+            if local is not None and width == 19:
+                return pd.DatetimeIndex(local).tz_localize('UTC')
+            if local is not None and width == 20 and bool(np.all(codes[:, 19] == ord('Z'))):
+                return pd.DatetimeIndex(local).tz_localize('UTC')
+            if local is not None and width == 25:
+                sign = codes[:, 19]
+                if bool(np.all((sign == ord('+')) | (sign == ord('-')))) and bool(np.all(codes[:, 22] == ord(':'))):
+                    digits = codes[:, [20, 21, 23, 24]].astype(np.int64) - ord('0')
+                    offsets = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 2] * 10 + digits[:, 3]) * 60
+                    offsets = np.where(sign == ord('-'), -offsets, offsets)
+                    utc = local - offsets.astype('timedelta64[s]')
+                    return pd.DatetimeIndex(utc).tz_localize('UTC')
+
+    return pd.DatetimeIndex(pd.to_datetime(np.asarray(dates, dtype=object), utc=True))
+
+
+def to_epochs(index):
+    """
+    Convertit un DatetimeIndex en nanosecondes depuis l'époque (int64, UTC), quelle que soit sa résolution.
+    """
+    return np.asarray(index.values, dtype='datetime64[ns]').view('int64')
+
+
+def normalize_samples(dates, values, sort_values=True):
+    """
+    Normalise en une seule passe vectorisée des dates et valeurs brutes provenant de plusieurs sous-requêtes:
+    conversion des dates en UTC, tri stable (par date puis par valeur si sort_values),
+    suppression des doublons de date (première occurrence conservée) et conversion en heure de Paris.
+    Renvoie un DataFrame indexé par date avec une colonne 'value'.
+    """
+    if len(dates) == 0:
+        return empty_samples()
+
+    if isinstance(dates, pd.DatetimeIndex):
+        index = dates.tz_convert('UTC') if dates.tz is not None else dates.tz_localize('UTC')
+    else:
+        index = parse_dates(dates)
+    values = np.asarray(values, dtype=float)
+    epochs = index.asi8
+
+    # Tri stable: np.lexsort trie selon la dernière clé puis les précédentes
+    order = np.lexsort((values, epochs)) if sort_values else np.argsort(epochs, kind='stable')
+    epochs = epochs[order]
+    values = values[order]
+
+    keep = np.empty(len(epochs), dtype=bool)
+    keep[0] = True
+    np.not_equal(epochs[1:], epochs[:-1], out=keep[1:])
+
+    index = index[order][keep].tz_convert('Europe/Paris')
+    index.name = 'date'
+    return pd.DataFrame({'value': values[keep]}, index=index)
+
+
+def concat_samples(data_frames, sort_values=True):
+    """
+    Fusionne des DataFrames d'historique déjà normalisés en un seul, trié et sans doublon de date.
+    """
+    data_frames = [data for data in data_frames if data is not None and not data.empty]
+    if not data_frames:
+        return empty_samples()
+    if len(data_frames) == 1:
+        return data_frames[0]
+    data = pd.concat(data_frames)
+    return normalize_samples(data.index, data['value'].to_numpy(), sort_values)
+
+
+class CounterState:
+    """
+    État conservé entre deux morceaux successifs d'un index de compteur traité par morceaux:
+    dernier relevé (date en nanosecondes UTC, valeur brute et index corrigé des remises à zéro)
+    et dernière borne d'intervalle calculée avec son index interpolé.
+    """
+    __slots__ = ('last_epoch', 'last_value', 'last_total', 'last_boundary', 'last_boundary_total')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.last_epoch = None
+        self.last_value = None
+        self.last_total = None
+        self.last_boundary = None
+        self.last_boundary_total = None
+
+
+# Nom historique de l'état utilisé par to_hourly
+HourlyState = CounterState
+
+
+def is_counter(values, tolerance=0.01):
+    """
+    Indique si des valeurs ressemblent à un index de compteur:
+    croissantes, à l'exception d'au plus `tolerance` (en proportion) de baisses (remises à zéro, bouclages).
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return True
+    decreases = np.count_nonzero(values[1:] < values[:-1])
+    return decreases <= tolerance * (len(values) - 1)
+
+
+def _floor(timestamp, freq):
+    """
+    Arrondit une date de Paris à la borne d'intervalle inférieure.
+    Les intervalles de moins d'un jour sont alignés en UTC (identique à Paris, dont les décalages sont des heures
+    entières), ce qui évite les heures ambiguës du passage à l'heure d'hiver; les autres sur l'heure locale.
+    """
+    offset = pd.tseries.frequencies.to_offset(freq)
+    if isinstance(offset, pd.offsets.Tick) and pd.Timedelta(offset) < pd.Timedelta(days=1):
+        return timestamp.tz_convert('UTC').floor(freq).tz_convert('Europe/Paris')
+    return timestamp.floor(freq, ambiguous=True, nonexistent='shift_forward')
+
+
+def counter_to_consumption(data, freq='h', rollover=None, max_gap=None, label='right', state=None):
+    """
+    Convertit un index de compteur normalisé (DataFrame indexé par date avec une colonne 'value')
+    en consommations par intervalle de durée `freq` ('15min', 'h', 'D', ...), de façon vectorisée.
+
+    L'index est interpolé linéairement sur les bornes des intervalles (heures piles pour 'h'),
+    de sorte qu'un intervalle sans relevé exactement sur sa borne n'est pas perdu.
+    Les baisses de l'index sont traitées comme:
+    - un bouclage si rollover (valeur maximale du compteur) est renseigné et que l'index repart près de zéro
+      depuis le haut de sa plage: la consommation est (rollover - ancien index) + nouvel index;
+    - une remise à zéro sinon: l'intervalle entre les deux relevés ne compte aucune consommation.
+    Si max_gap (Timedelta) est renseigné, les bornes situées dans un trou de relevés plus long valent NaN.
+
+    label='right' (comportement historique) date chaque consommation par la fin de son intervalle,
+    la première ligne valant 0; label='left' la date par le début de son intervalle.
+    Avec un CounterState, les données sont traitées comme la suite du morceau précédent
+    et seuls les nouveaux intervalles sont renvoyés.
+    Renvoie None si l'historique est vide.
+    """
+    if data is None or data.empty:
+        return None
+
+    index = data.index.tz_convert('Europe/Paris')
+    epochs = to_epochs(index)
+    values = data['value'].to_numpy(dtype=float)
+    continued = state is not None and state.last_epoch is not None
+    base = 0.0
+    if continued:
+        epochs = np.concatenate(([state.last_epoch], epochs))
+        values = np.concatenate(([state.last_value], values))
+        base = state.last_total - state.last_value
+
+    # Index corrigé des bouclages et remises à zéro (identique aux valeurs brutes en l'absence de baisse)
+    deltas = np.diff(values)
+    decreasing = deltas < 0
+    totals = values + base if base else values.copy()
+    if decreasing.any():
+        corrections = np.where(decreasing, -deltas, 0.0)
+        if rollover is not None:
+            wrapped = deltas + rollover
+            rolled = decreasing & (wrapped >= 0) & (wrapped <= rollover / 2)
+            corrections = np.where(rolled, rollover, corrections)
+        totals[1:] += np.cumsum(corrections)
+
+    first = pd.Timestamp(epochs[0], tz='UTC').tz_convert('Europe/Paris')
+    last = pd.Timestamp(epochs[-1], tz='UTC').tz_convert('Europe/Paris')
+    grid_start = state.last_boundary if continued and state.last_boundary is not None else _floor(first, freq)
+    boundaries = pd.date_range(grid_start, _floor(last, freq), freq=freq, name='date')
+    if not (continued and state.last_boundary is not None):
+        boundaries = boundaries[boundaries >= first]
+    grid = to_epochs(boundaries)
+
+    at_boundaries = np.interp(grid.astype(float), epochs.astype(float), totals)
+    if max_gap is not None and len(grid):
+        after = np.clip(np.searchsorted(epochs, grid, side='left'), 0, len(epochs) - 1)
+        before = np.clip(after - 1, 0, len(epochs) - 1)
+        exact = epochs[after] == grid
+        gap = epochs[after] - epochs[before]
+        at_boundaries[~exact & (gap > pd.Timedelta(max_gap).value)] = np.nan
+
+    if continued and state.last_boundary is not None and len(grid):
+        # La première borne a déjà été calculée avec le morceau précédent
+        at_boundaries[0] = state.last_boundary_total
+        consumption = np.diff(at_boundaries)
+        result_index = boundaries[1:] if label == 'right' else boundaries[:-1]
+    elif label == 'right':
+        consumption = np.diff(at_boundaries, prepend=at_boundaries[:1])
+        result_index = boundaries
+    else:
+        consumption = np.diff(at_boundaries)
+        result_index = boundaries[:-1]
+
+    if state is not None:
+        state.last_epoch = epochs[-1]
+        state.last_value = values[-1]
+        state.last_total = totals[-1]
+        if len(grid):
+            state.last_boundary = boundaries[-1]
+            state.last_boundary_total = at_boundaries[-1]
+
+    return pd.DataFrame({'value': consumption}, index=result_index)
+
+
+def to_hourly(data, is_counter_index=True, state=None, rollover=None):
+    """
+    Convertit un historique normalisé en valeurs horaires.
+    Si les valeurs sont un index de compteur (croissant, aux remises à zéro près), renvoie la consommation
+    de chaque heure calculée par counter_to_consumption, datée par la fin de l'heure,
+    sinon la moyenne horaire des valeurs.
+    Avec un HourlyState, l'historique est traité comme la suite du morceau précédent.
+    Renvoie None si l'historique est vide.
+    """
+    if data is None or data.empty:
+        return None
+
+    # Si les valeurs sont un index
+    if is_counter_index and is_counter(data['value'].to_numpy()):
+        return counter_to_consumption(data, 'h', rollover=rollover, state=state)
+
+    # Si les valeurs sont des consommations horaires ou moins
+    if state is not None:
+        state.reset()
+    return data['value'].resample('h').mean().to_frame()
+
+
+# Agrégats calculés à partir de l'index et enregistrés dans le cache; les semaines et mois en sont déduits
+ROLLUP_FREQS = ('15min', 'h', 'D')
+
+
+def aggregate_consumption(consumption, freq):
+    """
+    Somme des consommations par intervalle (datées par le début de l'intervalle) sur des intervalles plus longs:
+    'h', 'D', 'W' (semaines commençant le lundi) ou 'MS' (mois), selon le calendrier de Paris
+    (les jours de changement d'heure comptent 23 ou 25 heures).
+    Un intervalle sans aucune valeur vaut NaN.
+    """
+    if freq == 'W':
+        resampled = consumption['value'].resample('W-MON', label='left', closed='left')
+    else:
+        resampled = consumption['value'].resample(freq)
+    return resampled.sum(min_count=1).to_frame()
+
+
+def complete_buckets(aggregated, freq, start_date, end_date):
+    """
+    Ne garde d'une consommation agrégée par aggregate_consumption que les intervalles entièrement compris
+    dans [start_date, end_date) (datetime sans fuseau, heure de Paris): une semaine ou un mois à cheval
+    sur une borne ne contiendrait qu'une partie de sa consommation.
+    """
+    if aggregated.empty:
+        return aggregated
+    offset = pd.Timedelta(days=7) if freq == 'W' else pd.tseries.frequencies.to_offset(freq)
+    # Calcul en heure locale sans fuseau, pour que jours, semaines et mois suivent le calendrier de Paris
+    starts = aggregated.index.tz_localize(None)
+    keep = (starts >= pd.Timestamp(start_date)) & (starts + offset <= pd.Timestamp(end_date))
+    return aggregated[keep]
+
+
+def consumption_rollups(data, rollover=None, freqs=ROLLUP_FREQS):
+    """
+    Calcule en une passe les consommations d'un index de compteur normalisé à chaque granularité de freqs:
+    la première est obtenue par counter_to_consumption (datée par le début de l'intervalle),
+    les suivantes par agrégation de la précédente.
+    Seuls les intervalles entièrement couverts par les relevés sont renvoyés: un jour dont les derniers relevés
+    ne sont pas encore arrivés est omis plutôt que renvoyé incomplet.
+    Renvoie un dictionnaire {freq: DataFrame}, ou None si l'historique est vide.
+    """
+    base = counter_to_consumption(data, freqs[0], rollover=rollover, label='left')
+    if base is None:
+        return None
+    rollups = {freqs[0]: base}
+    if len(base):
+        # Période couverte par les relevés: de la première borne interpolée à la dernière
+        lower = base.index[0].tz_localize(None)
+        upper = (base.index[-1] + pd.tseries.frequencies.to_offset(freqs[0])).tz_localize(None)
+    for previous, freq in zip(freqs, freqs[1:]):
+        aggregated = aggregate_consumption(rollups[previous], freq)
+        rollups[freq] = complete_buckets(aggregated, freq, lower, upper) if len(base) else aggregated
+    return rollups
+
+
+def save_payloads(data, batch_size=5000, max_bytes=5 * 1024 * 1024):
+    """
+    Construit les charges utiles JSON d'enregistrement d'historique (modeSave 'history')
+    à partir d'un DataFrame indexé par date avec une colonne 'value'.
+    Les dates sont formatées et les valeurs sérialisées de façon vectorisée,
+    puis les lignes sont réparties en lots d'au plus batch_size lignes et max_bytes octets.
+    Renvoie une liste de charges utiles encodées en UTF-8.
+    """
+    records = pd.DataFrame({
+        'datetime': data.index.strftime('%Y-%m-%d %H:%M:%S'),
+        'value': data['value'].to_numpy(),
+    })
+
+    payloads = []
+    pending = [records.iloc[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    while pending:
+        batch = pending.pop(0)
+        payload = ('{"modeSave": "history", "data": '
+                   + batch.to_json(orient='records', double_precision=15) + '}').encode('utf-8')
+        # Un lot trop volumineux est coupé en deux jusqu'à respecter max_bytes
+        if len(payload) > max_bytes and len(batch) > 1:
+            middle = len(batch) // 2
+            pending[:0] = [batch.iloc[:middle], batch.iloc[middle:]]
+            continue
+        payloads.append(payload)
+    return payloads
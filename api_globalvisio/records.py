@@ -0,0 +1,138 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel
+    orjson = None
+
+
+def loads(content):
+    """
+    Décode un contenu JSON (bytes ou str), avec orjson s'il est installé.
+    Lève json.JSONDecodeError si le contenu n'est pas du JSON valide.
+    """
+    if orjson is not None:
+        # orjson.JSONDecodeError hérite de json.JSONDecodeError
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_json(response):
+    """
+    Décode une seule fois le corps JSON d'une réponse `requests`.
+    """
+    return loads(response.content)
+
+
+def _nested(data, *keys):
+    """
+    Renvoie data[keys[0]][keys[1]]..., ou None si un niveau intermédiaire est vide.
+    """
+    for key in keys:
+        if not data:
+            return None
+        data = data[key]
+    return data or None
+
+
+class SiteRecord:
+    """
+    Attributs d'un site tels que renvoyés par /api/sites/index/{id}.
+    """
+    __slots__ = ('id', 'nom', 'adresse', 'adresse2', 'code_postal', 'ville', 'pays', 'start')
+
+    def __init__(self, id, nom, adresse=None, adresse2=None, code_postal=None, ville=None, pays=None, start=None):
+        self.id = id
+        self.nom = nom
+        self.adresse = adresse
+        self.adresse2 = adresse2
+        self.code_postal = code_postal
+        self.ville = ville
+        self.pays = pays
+        self.start = start
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data.get('id'),
+            nom=data['nom'],
+            adresse=data['adresse'],
+            adresse2=data['adresse2'],
+            code_postal=data['codePostal'],
+            ville=data['ville'],
+            pays=data['pays'],
+            start=data['start'],
+        )
+
+
+class DeviceRecord:
+    """
+    Attributs d'un équipement tels que renvoyés par /api/devices/index/{id}.
+    points contient la liste brute des points de l'équipement, ou None si elle est absente
+    (lignes de /api/devices/listBySite).
+    """
+    __slots__ = ('id', 'site_id', 'mnemonique', 'nom', 'installation_debut', 'installation_fin',
+                 'derniere_connexion', 'frequence_communication', 'points')
+
+    def __init__(self, id, site_id, mnemonique=None, nom=None, installation_debut=None, installation_fin=None,
+                 derniere_connexion=None, frequence_communication=None, points=None):
+        self.id = id
+        self.site_id = site_id
+        self.mnemonique = mnemonique
+        self.nom = nom
+        self.installation_debut = installation_debut
+        self.installation_fin = installation_fin
+        self.derniere_connexion = derniere_connexion
+        self.frequence_communication = frequence_communication
+        self.points = points
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data.get('id'),
+            site_id=data['site']['id'],
+            mnemonique=data['mnemonique'],
+            nom=data['nom'],
+            installation_debut=data['installationDebut'],
+            installation_fin=data['installationFin'],
+            derniere_connexion=data['derniereConnexion'],
+            frequence_communication=data['frequenceCommunication'],
+            points=data.get('points'),
+        )
+
+
+class PointRecord:
+    """
+    Attributs d'un point tels que renvoyés par /api/points/index/{id}.
+    Les champs absents ou vides valent None.
+    """
+    __slots__ = ('id', 'device_id', 'site_id', 'label_automate', 'label_humain', 'last_value', 'last_value_date',
+                 'type', 'subtype', 'unit')
+
+    def __init__(self, id, device_id=None, site_id=None, label_automate=None, label_humain=None, last_value=None,
+                 last_value_date=None, type=None, subtype=None, unit=None):
+        self.id = id
+        self.device_id = device_id
+        self.site_id = site_id
+        self.label_automate = label_automate
+        self.label_humain = label_humain
+        self.last_value = last_value
+        self.last_value_date = last_value_date
+        self.type = type
+        self.subtype = subtype
+        self.unit = unit
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            id=data.get('id'),
+            device_id=data['device']['id'],
+            site_id=data['device']['site']['id'],
+            label_automate=data['labelAutomate'] or None,
+            label_humain=data['labelHumain'] or None,
+            last_value=data['lastValue'] or None,
+            last_value_date=data['lastValueDate'] or None,
+            type=_nested(data, 'type', 'nom'),
+            subtype=_nested(data, 'subtype', 'nom'),
+            unit=_nested(data, 'unit', 'symbole'),
+        )
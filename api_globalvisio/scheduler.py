@@ -0,0 +1,317 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+import pytz
+import requests
+
+PARIS_TIMEZONE = pytz.timezone('Europe/Paris')
+
+RETRY_STATUS_CODES = (429, 503)
+
+
+class RateLimitExceeded(requests.RequestException):
+    """
+    Levée lorsque le quota de requêtes restant (ou le budget réservé) ne permet plus d'envoyer une requête.
+    Hérite de requests.RequestException pour être traitée comme les autres erreurs de requête.
+    """
+
+
+class RequestScheduler:
+    """
+    Ordonnanceur des requêtes envoyées à GlobalVisio.
+    Combine un seau à jetons (débit maximal), une limite de concurrence adaptative
+    (divisée par deux sur 429/503, réaugmentée progressivement après des succès)
+    et le suivi de l'en-tête X-RateLimit-Remaining pour ne pas dépasser le quota journalier.
+    Le quota restant observé est oublié à minuit (heure de Paris), lorsque le quota journalier est renouvelé.
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=16, min_concurrency=1, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, min_remaining=0, probe_interval=600.0):
+        """
+        rate: nombre maximal de requêtes par seconde (None pour ne pas limiter le débit).
+        burst: nombre de requêtes pouvant partir d'un coup (par défaut égal à rate).
+        max_concurrency / min_concurrency: bornes de la limite de requêtes simultanées.
+        max_retries: nombre de nouvelles tentatives sur les réponses 429/503.
+        min_remaining: quota journalier à ne jamais entamer (les requêtes sont refusées en dessous).
+        probe_interval: une fois le quota atteint, délai en secondes après lequel une requête d'essai est
+        autorisée pour relire X-RateLimit-Remaining (None pour attendre minuit).
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_remaining = min_remaining
+        self.probe_interval = probe_interval
+
+        self.concurrency = max_concurrency
+        self.remaining = None
+        self.remaining_expires = None
+        self.paused_until = 0.0
+        self._next_probe = 0.0
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._successes = 0
+        self._budgets = []
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _expire_remaining(self, now):
+        """
+        Oublie le quota restant observé s'il date d'un jour précédent (heure de Paris).
+        """
+        if self.remaining_expires is not None and now >= self.remaining_expires:
+            self.remaining = None
+            self.remaining_expires = None
+
+    def _quota_exhausted(self, now):
+        """
+        Indique si le quota journalier interdit d'envoyer une requête.
+        Toutes les probe_interval secondes, une requête d'essai est tout de même autorisée,
+        afin de relire le quota si celui-ci a été renouvelé avant minuit.
+        """
+        self._expire_remaining(now)
+        if self.remaining is None or self.remaining > self.min_remaining:
+            return False
+        if self.probe_interval is not None and now >= self._next_probe:
+            self._next_probe = now + self.probe_interval
+            return False
+        return True
+
+    def _wait_time(self, now):
+        """
+        Temps d'attente avant de pouvoir envoyer une requête (0 si possible immédiatement).
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def acquire(self):
+        """
+        Bloque jusqu'à ce qu'une requête puisse être envoyée.
+        Lève RateLimitExceeded si le quota journalier ou le budget réservé est épuisé.
+        """
+        with self._condition:
+            while True:
+                if self._quota_exhausted(time.monotonic()):
+                    raise RateLimitExceeded(f'Quota journalier de requêtes atteint ({self.remaining} restantes)')
+                for budget in self._budgets:
+                    if budget.used >= budget.size:
+                        raise RateLimitExceeded(f'Budget réservé de {budget.size} requêtes épuisé')
+
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(now)
+                if self._in_flight < self.concurrency and wait <= 0:
+                    break
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+            if self.rate:
+                self._tokens -= 1
+            self._in_flight += 1
+            for budget in self._budgets:
+                budget.used += 1
+
+    def release(self, response=None):
+        """
+        Libère la place occupée par une requête et met à jour l'état à partir de sa réponse.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if response is not None:
+                self._update(response)
+            self._condition.notify_all()
+
+    def _update(self, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            try:
+                self.remaining = int(remaining)
+            except ValueError:
+                pass
+            else:
+                self.remaining_expires = time.monotonic() + seconds_until_midnight()
+                if self.remaining <= self.min_remaining and self._next_probe <= time.monotonic():
+                    self._next_probe = time.monotonic() + (self.probe_interval or 0.0)
+
+        if response.status_code in RETRY_STATUS_CODES:
+            # Décroissance multiplicative de la concurrence et pause globale
+            self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            self._successes = 0
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        elif response.status_code < 400:
+            # Croissance additive après une série de succès
+            self._successes += 1
+            if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._successes = 0
+
+    def should_retry(self, response, attempt):
+        return response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries
+
+    def retry_delay(self, response, attempt):
+        """
+        Délai avant une nouvelle tentative: Retry-After s'il est fourni,
+        sinon attente exponentielle avec gigue complète.
+        """
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @contextmanager
+    def reserve(self, size):
+        """
+        Réserve un budget de `size` requêtes pour un traitement par lots.
+        Lève RateLimitExceeded dès l'entrée si le quota restant connu ne le permet pas,
+        puis refuse toute requête au-delà du budget pendant le traitement.
+
+        with scheduler.reserve(500) as budget:
+            ...
+        print(budget.used)
+        """
+        budget = Budget(size)
+        with self._condition:
+            self._expire_remaining(time.monotonic())
+            reserved = sum(other.size - other.used for other in self._budgets)
+            if self.remaining is not None and self.remaining - self.min_remaining < reserved + size:
+                raise RateLimitExceeded(
+                    f'Quota insuffisant pour réserver {size} requêtes ({self.remaining} restantes, {reserved} déjà réservées)')
+            self._budgets.append(budget)
+        try:
+            yield budget
+        finally:
+            with self._condition:
+                self._budgets.remove(budget)
+                self._condition.notify_all()
+
+
+class Budget:
+    """
+    Budget de requêtes réservé via RequestScheduler.reserve.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+
+    @property
+    def left(self):
+        return max(0, self.size - self.used)
+
+
+def seconds_until_midnight():
+    """
+    Nombre de secondes jusqu'au prochain minuit en heure de Paris (renouvellement du quota journalier).
+    """
+    now = datetime.now(PARIS_TIMEZONE)
+    midnight = PARIS_TIMEZONE.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    return max(0.0, (midnight - now).total_seconds())
+
+
+def parse_retry_after(value):
+    """
+    Convertit la valeur d'un en-tête Retry-After (secondes ou date HTTP) en secondes.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitOpen(requests.RequestException):
+    """
+    Levée lorsque le disjoncteur d'un endpoint est ouvert: la requête n'est pas envoyée.
+    Hérite de requests.RequestException pour être traitée comme les autres erreurs de requête.
+    """
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur par endpoint: après `failure_threshold` échecs consécutifs (erreur réseau ou réponse 5xx),
+    les requêtes vers cet endpoint échouent immédiatement pendant `reset_timeout` secondes,
+    puis une seule requête d'essai est autorisée: son succès referme le disjoncteur, son échec le rouvre.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        # endpoint -> [échecs consécutifs, date d'ouverture (ou None), essai en cours]
+        self._states = {}
+
+    def state(self, endpoint):
+        """
+        Renvoie l'état du disjoncteur d'un endpoint: 'closed', 'open' ou 'half-open'.
+        """
+        with self._lock:
+            failures, opened_at, trial = self._states.get(endpoint, (0, None, False))
+        if opened_at is None:
+            return 'closed'
+        if time.monotonic() - opened_at < self.reset_timeout and not trial:
+            return 'open'
+        return 'half-open'
+
+    def before(self, endpoint):
+        """
+        Autorise une requête vers l'endpoint, ou lève CircuitOpen si le disjoncteur est ouvert.
+        """
+        with self._lock:
+            state = self._states.get(endpoint)
+            if state is None or state[1] is None:
+                return
+            if state[2] or time.monotonic() - state[1] < self.reset_timeout:
+                remaining = max(0.0, self.reset_timeout - (time.monotonic() - state[1]))
+                raise CircuitOpen(f"Endpoint {endpoint} indisponible (disjoncteur ouvert, réessai dans {remaining:.0f} s)")
+            # Délai écoulé: une seule requête d'essai
+            state[2] = True
+
+    def cancel(self, endpoint):
+        """
+        Annule la requête d'essai autorisée par before() lorsqu'elle n'a finalement pas été envoyée
+        (par exemple refusée par l'ordonnanceur): une prochaine requête pourra servir d'essai.
+        """
+        with self._lock:
+            state = self._states.get(endpoint)
+            if state is not None:
+                state[2] = False
+
+    def success(self, endpoint):
+        with self._lock:
+            self._states.pop(endpoint, None)
+
+    def failure(self, endpoint):
+        with self._lock:
+            state = self._states.setdefault(endpoint, [0, None, False])
+            state[0] += 1
+            if state[2] or state[0] >= self.failure_threshold:
+                state[1] = time.monotonic()
+                state[2] = False
+
+    def reset(self):
+        with self._lock:
+            self._states = {}
@@ -0,0 +1,167 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .processing import to_epochs
+
+
+def _to_epoch(value):
+    """
+    Convertit une date (en heure de Paris si elle n'a pas de fuseau) en nanosecondes depuis l'époque.
+    """
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('Europe/Paris', ambiguous=True, nonexistent='shift_forward')
+    return timestamp.value
+
+
+class SeriesStore:
+    """
+    Stockage compact en colonnes des historiques de nombreux points.
+    Chaque point est conservé sous forme de deux tableaux NumPy triés par date:
+    dates en nanosecondes depuis l'époque (int64, UTC) et valeurs (float64 ou float32),
+    soit environ 12 à 16 octets par valeur au lieu d'un DataFrame pandas par point.
+    Avec un répertoire `path`, les tableaux sont enregistrés en fichiers .npy et relus en mémoire projetée (mmap),
+    de sorte que seules les pages lues sont chargées.
+    La conversion en pandas n'a lieu qu'à la demande (to_pandas, to_frame).
+    """
+
+    def __init__(self, path=None, dtype='float64'):
+        """
+        path: répertoire des fichiers .npy (None pour un stockage uniquement en mémoire).
+        dtype: type des valeurs ('float64', ou 'float32' pour diviser leur taille par deux).
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._series = {}
+        if path:
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):
+                if name.endswith('.dates.npy'):
+                    point_id = int(name[:-len('.dates.npy')])
+                    self._series[point_id] = self._load(point_id)
+
+    def _files(self, point_id):
+        return (os.path.join(self.path, f'{point_id}.dates.npy'),
+                os.path.join(self.path, f'{point_id}.values.npy'))
+
+    def _load(self, point_id):
+        dates_file, values_file = self._files(point_id)
+        return np.load(dates_file, mmap_mode='r'), np.load(values_file, mmap_mode='r')
+
+    def _dump(self, point_id, epochs, values):
+        # Écriture dans des fichiers temporaires puis remplacement, pour ne jamais laisser de fichier partiel
+        for file, array in zip(self._files(point_id), (epochs, values)):
+            temporary_file = f'{file[:-len(".npy")]}.tmp.npy'
+            np.save(temporary_file, array)
+            os.replace(temporary_file, file)
+        return self._load(point_id)
+
+    def write(self, point_id, data):
+        """
+        Ajoute l'historique d'un point (DataFrame indexé par date avec une colonne 'value', ou Series).
+        Les dates déjà présentes sont remplacées par les nouvelles valeurs.
+        """
+        if data is None or len(data) == 0:
+            return
+        series = data['value'] if isinstance(data, pd.DataFrame) else data
+        epochs = to_epochs(series.index)
+        values = series.to_numpy(dtype=self.dtype)
+        if not (len(epochs) < 2 or bool(np.all(epochs[1:] > epochs[:-1]))):
+            order = np.argsort(epochs, kind='stable')
+            epochs, values = epochs[order], values[order]
+            keep = np.concatenate(([True], epochs[1:] != epochs[:-1]))
+            epochs, values = epochs[keep], values[keep]
+
+        point_id = int(point_id)
+        with self._lock:
+            existing = self._series.get(point_id)
+            if existing is not None and len(existing[0]):
+                old_epochs, old_values = existing
+                if epochs[0] > old_epochs[-1]:
+                    # Cas courant: les nouvelles valeurs suivent les anciennes
+                    epochs = np.concatenate((old_epochs, epochs))
+                    values = np.concatenate((old_values, values))
+                else:
+                    kept = ~np.isin(old_epochs, epochs)
+                    epochs = np.concatenate((old_epochs[kept], epochs))
+                    values = np.concatenate((old_values[kept], values))
+                    order = np.argsort(epochs, kind='stable')
+                    epochs, values = epochs[order], values[order]
+
+            if self.path:
+                self._series[point_id] = self._dump(point_id, epochs, values)
+            else:
+                self._series[point_id] = (epochs, values)
+
+    def read(self, point_id, start=None, end=None):
+        """
+        Renvoie les tableaux (dates en ns UTC, valeurs) d'un point entre start (inclus) et end (exclu),
+        sans copie, ou None si le point est absent. start et end sont des dates (str, datetime ou Timestamp),
+        en heure de Paris si elles n'ont pas de fuseau.
+        """
+        series = self._series.get(int(point_id))
+        if series is None:
+            return None
+        epochs, values = series
+        lower = 0 if start is None else np.searchsorted(epochs, _to_epoch(start), side='left')
+        upper = len(epochs) if end is None else np.searchsorted(epochs, _to_epoch(end), side='left')
+        return epochs[lower:upper], values[lower:upper]
+
+    def to_pandas(self, point_id, start=None, end=None):
+        """
+        Convertit l'historique d'un point en DataFrame indexé par date (heure de Paris) avec une colonne 'value'.
+        """
+        series = self.read(point_id, start, end)
+        if series is None:
+            return None
+        epochs, values = series
+        index = pd.DatetimeIndex(np.asarray(epochs).view('datetime64[ns]')).tz_localize('UTC') \
+            .tz_convert('Europe/Paris')
+        index.name = 'date'
+        return pd.DataFrame({'value': np.asarray(values, dtype=float)}, index=index)
+
+    def to_frame(self, point_ids=None, start=None, end=None):
+        """
+        Convertit plusieurs points (tous par défaut) en DataFrame large, avec une colonne par point.
+        """
+        point_ids = self.point_ids() if point_ids is None else point_ids
+        columns = {}
+        for point_id in point_ids:
+            data = self.to_pandas(point_id, start, end)
+            if data is not None:
+                columns[int(point_id)] = data['value']
+        data = pd.DataFrame(columns)
+        data.index.name = 'date'
+        return data
+
+    def point_ids(self):
+        return sorted(self._series)
+
+    def drop(self, point_id):
+        """
+        Supprime l'historique d'un point (et ses fichiers).
+        """
+        point_id = int(point_id)
+        with self._lock:
+            self._series.pop(point_id, None)
+            if self.path:
+                for file in self._files(point_id):
+                    if os.path.exists(file):
+                        os.remove(file)
+
+    @property
+    def nbytes(self):
+        """
+        Taille totale des tableaux en octets.
+        """
+        return sum(epochs.nbytes + values.nbytes for epochs, values in self._series.values())
+
+    def __contains__(self, point_id):
+        return int(point_id) in self._series
+
+    def __len__(self):
+        return len(self._series)
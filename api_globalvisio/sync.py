@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from . import core
+from .processing import normalize_samples
+
+
+def _to_timestamp(value):
+    """
+    Convertit une date ('yyyy-mm-dd HH:MM:SS' en heure de Paris, ISO 8601 ou Timestamp) en Timestamp de Paris.
+    """
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize('Europe/Paris', ambiguous=True, nonexistent='shift_forward')
+    return timestamp.tz_convert('Europe/Paris')
+
+
+class HistorySync:
+    """
+    Synchronisation incrémentale des historiques d'un ensemble de points.
+    Chaque point a un filigrane (date du dernier relevé reçu), initialisé à partir de Point.last_value_date:
+    seuls les jours à partir du filigrane sont demandés à l'API, et seuls les relevés postérieurs sont renvoyés.
+    Les filigranes peuvent être enregistrés dans un fichier JSON pour reprendre entre deux exécutions.
+    """
+
+    def __init__(self, point_ids, max_workers=8, path=None, on_data=None):
+        """
+        point_ids: identifiants des points à synchroniser.
+        max_workers: nombre de points synchronisés en parallèle.
+        path: fichier JSON où les filigranes sont relus à l'initialisation et enregistrés après chaque passage.
+        on_data: fonction appelée avec (point_id, DataFrame des nouveaux relevés) pour chaque point ayant reçu des données.
+        """
+        self.point_ids = [int(point_id) for point_id in point_ids]
+        self.max_workers = max_workers
+        self.path = path
+        self.on_data = on_data
+        self.watermarks = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if path and os.path.exists(path):
+            self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"ERREUR lors de la lecture des filigranes {self.path}: {e}")
+            return
+        self.watermarks = {int(point_id): _to_timestamp(value) for point_id, value in content.items()}
+
+    def save(self):
+        """
+        Enregistre les filigranes dans le fichier `path`.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            content = {str(point_id): watermark.isoformat() for point_id, watermark in self.watermarks.items()}
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(content, file)
+        os.replace(temporary_path, self.path)
+
+    def seed(self, point_id):
+        """
+        Initialise le filigrane d'un point à la date de sa dernière valeur (Point.last_value_date),
+        ou à l'instant présent si elle est inconnue. Renvoie le filigrane.
+        """
+        point = core.Point(point_id)
+        point.get_point_attributes()
+        if point.last_value_date:
+            watermark = _to_timestamp(point.last_value_date)
+        else:
+            watermark = pd.Timestamp.now(tz='Europe/Paris')
+        with self._lock:
+            self.watermarks[point_id] = watermark
+        return watermark
+
+    def sync_point(self, point_id):
+        """
+        Récupère les relevés d'un point postérieurs à son filigrane et avance le filigrane.
+        Renvoie un DataFrame des nouveaux relevés (éventuellement vide), ou None en cas d'erreur.
+        """
+        watermark = self.watermarks.get(point_id)
+        if watermark is None:
+            watermark = self.seed(point_id)
+
+        # L'API travaille par jour: la période demandée commence le jour du filigrane et se termine demain
+        start_date = datetime(watermark.year, watermark.month, watermark.day)
+        today = pd.Timestamp.now(tz='Europe/Paris')
+        end_date = datetime(today.year, today.month, today.day) + timedelta(days=1)
+        point = core.Point(point_id)
+        windows = core._split_period(start_date, end_date, point._history_window())
+        results = point._fetch_windows(point._fetch_history_window, windows)
+        if results is None:
+            return None
+
+        dates = [date for sub_dates, _ in results for date in sub_dates]
+        values = [value for _, sub_values in results for value in sub_values]
+        data = normalize_samples(dates, values)
+        data = data[data.index > watermark]
+        if not data.empty:
+            # Le filigrane n'avance qu'une fois les relevés transmis, pour qu'un échec de on_data les redemande
+            if self.on_data is not None:
+                self.on_data(point_id, data)
+            with self._lock:
+                self.watermarks[point_id] = data.index[-1]
+        return data
+
+    def _sync_point_safely(self, point_id):
+        """
+        Synchronise un point; une erreur (date illisible, exception levée par on_data...) est signalée
+        et n'interrompt pas la synchronisation des autres points. Renvoie None dans ce cas.
+        """
+        try:
+            return self.sync_point(point_id)
+        except Exception as e:
+            print(f"ERREUR lors de la synchronisation du point {point_id}: {e!r}")
+            return None
+
+    def sync(self):
+        """
+        Synchronise tous les points en parallèle sur max_workers threads.
+        Renvoie un dictionnaire {point_id: DataFrame des nouveaux relevés, ou None en cas d'erreur}.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            results = dict(zip(self.point_ids, executor.map(self._sync_point_safely, self.point_ids)))
+        self.save()
+        return results
+
+    def run(self, interval=60, iterations=None):
+        """
+        Synchronise les points toutes les `interval` secondes, jusqu'à `iterations` passages
+        (indéfiniment si None) ou jusqu'à l'appel de stop().
+        """
+        self._stop.clear()
+        count = 0
+        while not self._stop.is_set() and (iterations is None or count < iterations):
+            started = time.monotonic()
+            self.sync()
+            count += 1
+            if iterations is not None and count >= iterations:
+                break
+            self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def stop(self):
+        """
+        Interrompt la boucle de run() après le passage en cours.
+        """
+        self._stop.set()
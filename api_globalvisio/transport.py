@@ -0,0 +1,168 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import endpoint_name, metrics as default_metrics
+from .scheduler import CircuitBreaker, RequestScheduler
+
+BASE_URL = 'https://global-visio.com/api'
+
+
+class Transport:
+    """
+    Transport HTTP partagé par toutes les fonctions et classes du package.
+    Maintient une unique session `requests` avec un pool de connexions keep-alive,
+    afin que les appels successifs à GlobalVisio réutilisent les connexions TCP/TLS.
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_connections=10, pool_maxsize=20, timeout=(10, 120), scheduler=None,
+                 metrics=None, breaker=None):
+        """
+        Initialisation du transport.
+        timeout est soit un nombre de secondes, soit un tuple (connexion, lecture).
+        scheduler est le RequestScheduler qui régule le débit des requêtes.
+        metrics est l'objet Metrics qui enregistre chaque requête (celui du module metrics par défaut).
+        breaker est le CircuitBreaker qui coupe temporairement un endpoint en échec répété.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.headers = {'Content-Type': 'application/json'}
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        Session `requests` créée à la première utilisation puis partagée entre tous les threads.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        # Les en-têtes par défaut sont construits une seule fois pour toute la session
+        session.headers.update(self.headers)
+        return session
+
+    def configure(self, base_url=None, pool_connections=None, pool_maxsize=None, timeout=None, headers=None,
+                  scheduler=None, breaker=None):
+        """
+        Modifie la configuration du transport.
+        La session courante est fermée et sera reconstruite au prochain appel.
+        """
+        if base_url is not None:
+            self.base_url = base_url.rstrip('/')
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if timeout is not None:
+            self.timeout = timeout
+        if headers:
+            self.headers.update(headers)
+        if scheduler is not None:
+            self.scheduler = scheduler
+        if breaker is not None:
+            self.breaker = breaker
+        self.close()
+
+    def set_header(self, name, value):
+        """
+        Définit (ou supprime si value vaut None) un en-tête envoyé avec chaque requête.
+        """
+        if value is None:
+            self.headers.pop(name, None)
+        else:
+            self.headers[name] = value
+
+        session = self._session
+        if session is not None:
+            if value is None:
+                session.headers.pop(name, None)
+            else:
+                session.headers[name] = value
+
+    def url(self, path):
+        """
+        Construit l'URL complète d'un chemin de l'API (ex: 'sites/index').
+        """
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        """
+        Envoie une requête via la session partagée et renvoie la réponse `requests`.
+        Le débit est régulé par l'ordonnanceur, et les réponses 429/503 sont retentées
+        après le délai indiqué par Retry-After (ou une attente exponentielle).
+        Lève CircuitOpen sans envoyer la requête si l'endpoint est coupé par le disjoncteur.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.url(path)
+        endpoint = endpoint_name(path)
+        attempt = 0
+        while True:
+            self.breaker.before(endpoint)
+            try:
+                self.scheduler.acquire()
+            except BaseException:
+                # Requête non envoyée: elle ne compte ni comme succès ni comme échec
+                self.breaker.cancel(endpoint)
+                raise
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception as e:
+                self.scheduler.release()
+                self.breaker.failure(endpoint)
+                self.metrics.record(path, method, latency=time.perf_counter() - start, retry=attempt > 0, error=e)
+                raise
+            self.scheduler.release(response)
+            if response.status_code >= 500:
+                self.breaker.failure(endpoint)
+            else:
+                self.breaker.success(endpoint)
+            self.metrics.record(path, method, response.status_code, time.perf_counter() - start, len(response.content),
+                                retry=attempt > 0, rate_limit_remaining=response.headers.get('X-RateLimit-Remaining'))
+
+            if not self.scheduler.should_retry(response, attempt):
+                return response
+            time.sleep(self.scheduler.retry_delay(response, attempt))
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        """
+        Ferme la session et libère les connexions du pool.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+transport = Transport()
+
+
+def configure_transport(**kwargs):
+    """
+    Configure le transport partagé (base_url, pool_connections, pool_maxsize, timeout, headers, scheduler, breaker).
+    """
+    transport.configure(**kwargs)
+    return transport
@@ -0,0 +1,185 @@
+"""
+Mesure le débit et la latence des fonctions du client contre le serveur local de mock_server.py,
+sans jamais contacter l'API réelle.
+
+Scénarios: listes (get_all_sites, get_all_devices, get_all_points, get_all_points_from_site),
+Point.get_history, Point.get_consumption_day et Point.save_history.
+
+Lancement:
+    python benchmarks/bench_client.py --latency 0.05 --years 3 --repeat 3
+    python benchmarks/bench_client.py --only history consumption --rate-limit 500
+
+Garde-fou de performance: --save enregistre les mesures dans un fichier JSON de référence,
+--compare les compare à une référence et renvoie le code de sortie 1 si un scénario échoue,
+envoie plus de requêtes, ou dépasse la durée de référence de plus de --tolerance (20 % par défaut).
+    python benchmarks/bench_client.py --save benchmarks/baseline.json
+    python benchmarks/bench_client.py --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import api_globalvisio as gv  # noqa: E402
+from mock_server import start_server  # noqa: E402
+
+POINT_ID = 10101
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[index]
+
+
+def run_scenario(name, function, state, repeat):
+    """
+    Exécute `function` `repeat` fois et renvoie un dictionnaire de mesures:
+    durée totale (meilleure et médiane), nombre de requêtes, latences par requête et volume reçu.
+    """
+    latencies = []
+    received = [0]
+
+    def hook(event):
+        latencies.append(event['latency'])
+        received[0] += event['bytes']
+
+    gv.metrics.add_hook(hook)
+    durations = []
+    requests_count = 0
+    result = None
+    try:
+        for _ in range(repeat):
+            state.reset()
+            # Le compteur du serveur repart de zéro: le quota mémorisé par le client aussi
+            gv.transport.scheduler.remaining = None
+            start = time.perf_counter()
+            result = function()
+            durations.append(time.perf_counter() - start)
+            requests_count = state.requests
+    finally:
+        gv.metrics.remove_hook(hook)
+
+    best = min(durations)
+    return {
+        'name': name,
+        'ok': result is not None and result is not False,
+        'best': best,
+        'median': statistics.median(durations),
+        'requests': requests_count,
+        'throughput': requests_count / best if best else 0.0,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'megabytes': received[0] / repeat / 1e6,
+    }
+
+
+def build_scenarios(args):
+    start_date = f'{2024 - args.years}-01-01'
+    end_date = '2024-01-01'
+    point = gv.Point(POINT_ID)
+    point.get_point_attributes()
+    hourly = point.get_history(start_date, end_date)
+
+    return {
+        'sites': lambda: gv.get_all_sites(),
+        'devices': lambda: gv.get_all_devices(1),
+        'points': lambda: gv.get_all_points(101),
+        'points_from_site': lambda: gv.get_all_points_from_site(gv.get_all_sites()['id'].tolist()),
+        'history': lambda: point.get_history(start_date, end_date, max_workers=args.workers),
+        'history_raw': lambda: point.get_history(start_date, end_date, is_counter_index=False,
+                                                 max_workers=args.workers),
+        'consumption': lambda: point.get_consumption_day(start_date, end_date, max_workers=args.workers),
+        'save': lambda: point.save_history(hourly, max_workers=args.workers or 4),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare les mesures à celles d'une référence enregistrée par --save.
+    Renvoie la liste des régressions (messages).
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['name'])
+        if reference is None:
+            continue
+        if not result['ok']:
+            regressions.append(f"{result['name']}: échec")
+        if result['requests'] > reference['requests']:
+            regressions.append(f"{result['name']}: {result['requests']} requêtes au lieu de {reference['requests']}")
+        limit = reference['best'] * (1 + tolerance)
+        if result['best'] > limit:
+            regressions.append(f"{result['name']}: {result['best']:.3f} s au lieu de {reference['best']:.3f} s "
+                               f"(limite {limit:.3f} s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du client GlobalVisio contre un serveur local.')
+    parser.add_argument('--latency', type=float, default=0.02, help='latence artificielle du serveur (s)')
+    parser.add_argument('--rate-limit', type=int, default=None, help='nombre de requêtes avant les réponses 429')
+    parser.add_argument('--step-minutes', type=int, default=10, help='pas des échantillons synthétiques')
+    parser.add_argument('--sites', type=int, default=10)
+    parser.add_argument('--years', type=int, default=2, help="profondeur des historiques demandés")
+    parser.add_argument('--workers', type=int, default=None, help='max_workers des historiques (None: défaut)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', default=None, help='scénarios à exécuter')
+    parser.add_argument('--save', default=None, help='fichier JSON où enregistrer les mesures de référence')
+    parser.add_argument('--compare', default=None, help='fichier JSON de référence auquel comparer les mesures')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='dépassement relatif de la durée de référence toléré par --compare')
+    args = parser.parse_args()
+
+    server, state, base_url = start_server(latency=args.latency, rate_limit=args.rate_limit,
+                                           step_minutes=args.step_minutes, n_sites=args.sites)
+    try:
+        gv.configure_transport(base_url=base_url)
+        gv.credentials.set_credentials('benchmark', 'benchmark')
+        gv.credentials.set_api_key('benchmark')
+
+        scenarios = build_scenarios(args)
+        names = args.only or list(scenarios)
+        print(f'Serveur local {base_url}, latence {args.latency * 1000:.0f} ms, {args.sites} sites, '
+              f'historiques sur {args.years} an(s)')
+        print(f"{'scénario':<18} {'meilleur (s)':>12} {'médiane (s)':>12} {'requêtes':>9} {'req/s':>8} "
+              f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'Mo reçus':>9}")
+        results = []
+        for name in names:
+            if name not in scenarios:
+                print(f'ERREUR scénario inconnu: {name}')
+                continue
+            result = run_scenario(name, scenarios[name], state, args.repeat)
+            results.append(result)
+            status = '' if result['ok'] else '  (ECHEC)'
+            print(f"{name:<18} {result['best']:>12.3f} {result['median']:>12.3f} {result['requests']:>9} "
+                  f"{result['throughput']:>8.1f} {result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} "
+                  f"{result['megabytes']:>9.2f}{status}")
+    finally:
+        server.shutdown()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump({result['name']: result for result in results}, file, indent=2)
+        print(f'Mesures de référence enregistrées dans {args.save}')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print(f'Aucune régression par rapport à {args.compare}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
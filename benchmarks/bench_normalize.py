@@ -0,0 +1,111 @@
+"""
+Compare le post-traitement historique (un DataFrame par sous-requête puis concaténation)
+à la normalisation vectorisée en une seule passe de api_globalvisio.processing.
+
+Lancement:
+    python benchmarks/bench_normalize.py --years 5 --step-minutes 10
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api_globalvisio.processing import normalize_samples, records_to_lists, to_hourly  # noqa: E402
+
+
+def make_chunks(years, step_minutes, window_days=88):
+    """
+    Génère des réponses synthétiques (listes d'enregistrements {'date', 'value'}) découpées comme l'API.
+    """
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=365 * years)
+    step = timedelta(minutes=step_minutes)
+    chunks = []
+    chunk_start = start
+    index = 0
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=window_days), end)
+        records = []
+        current = chunk_start
+        while current < chunk_end:
+            records.append({'date': current.strftime('%Y-%m-%dT%H:%M:%S+00:00'), 'value': index * 0.5})
+            current += step
+            index += 1
+        chunks.append(records)
+        chunk_start = chunk_end
+    return chunks
+
+
+def legacy_pipeline(chunks, is_counter_index=True):
+    """
+    Reproduction du traitement historique de Point.get_history (un DataFrame par sous-requête).
+    """
+    data_frames = []
+    for records in chunks:
+        sub_data = pd.DataFrame(records)
+        sub_data = sub_data[['date', 'value']]
+        sub_data['date'] = pd.to_datetime(sub_data['date'], utc=True)
+        sub_data = sub_data.sort_values(by=['date', 'value'], ascending=[True, True])
+        sub_data['date'] = sub_data['date'].dt.tz_convert('Europe/Paris')
+        sub_data.drop_duplicates(subset='date', keep='first', inplace=True)
+        sub_data.set_index('date', inplace=True)
+        data_frames.append(sub_data)
+
+    df_concat = pd.concat(data_frames)
+    if df_concat['value'].is_monotonic_increasing and is_counter_index:
+        df_concat = df_concat[(df_concat.index.minute == 0) & (df_concat.index.second == 0)]
+        df_concat['value'] = df_concat.iloc[:, 0].diff()
+        if not df_concat.empty:
+            df_concat.iloc[0, 0] = 0.0
+    else:
+        df_concat = df_concat['value'].resample('h').mean().to_frame()
+    return df_concat
+
+
+def vectorized_pipeline(chunks, is_counter_index=True):
+    dates, values = [], []
+    for records in chunks:
+        sub_dates, sub_values = records_to_lists(records)
+        dates.extend(sub_dates)
+        values.extend(sub_values)
+    return to_hourly(normalize_samples(dates, values), is_counter_index)
+
+
+def best_time(function, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la normalisation des historiques.')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--step-minutes', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.years, args.step_minutes)
+    n_samples = sum(len(records) for records in chunks)
+    print(f'{n_samples} échantillons répartis en {len(chunks)} sous-requêtes')
+
+    for is_counter_index in (True, False):
+        legacy_time, legacy = best_time(lambda: legacy_pipeline(chunks, is_counter_index), args.repeat)
+        vectorized_time, vectorized = best_time(lambda: vectorized_pipeline(chunks, is_counter_index), args.repeat)
+        same = legacy['value'].to_numpy().tolist() == vectorized['value'].to_numpy().tolist() \
+            and (legacy.index == vectorized.index).all()
+        mode = 'index de compteur' if is_counter_index else 'moyenne horaire'
+        print(f'[{mode}] historique: {legacy_time:.3f} s, vectorisé: {vectorized_time:.3f} s, '
+              f'gain x{legacy_time / vectorized_time:.1f}, résultats identiques: {same}')
+
+
+if __name__ == '__main__':
+    main()
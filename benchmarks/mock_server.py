@@ -0,0 +1,228 @@
+"""
+Serveur local imitant l'API de GlobalVisio, utilisé par les benchmarks.
+
+Les données sont synthétiques et déterministes: chaque point produit un index de compteur
+croissant échantillonné toutes les `step_minutes` minutes.
+Une latence artificielle et une limite de requêtes peuvent être configurées.
+
+Lancement autonome:
+    python benchmarks/mock_server.py --port 8765 --latency 0.05
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockState:
+    """
+    Configuration et compteurs partagés par toutes les requêtes du serveur.
+    """
+
+    def __init__(self, n_sites=3, devices_per_site=4, points_per_device=5, step_minutes=10,
+                 latency=0.0, rate_limit=None, per_page_max=100):
+        self.n_sites = n_sites
+        self.devices_per_site = devices_per_site
+        self.points_per_device = points_per_device
+        self.step_minutes = step_minutes
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.per_page_max = per_page_max
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.requests_by_endpoint = {}
+        self.saved = {}
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests += 1
+            self.requests_by_endpoint[endpoint] = self.requests_by_endpoint.get(endpoint, 0) + 1
+            return self.requests
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.requests_by_endpoint = {}
+            self.saved = {}
+
+    # Hiérarchie synthétique: site s -> équipements s*100+d -> points (s*100+d)*100+p
+    def site_ids(self):
+        return list(range(1, self.n_sites + 1))
+
+    def device_ids(self, site_id):
+        return [site_id * 100 + d for d in range(1, self.devices_per_site + 1)]
+
+    def point_ids(self, device_id):
+        return [device_id * 100 + p for p in range(1, self.points_per_device + 1)]
+
+    def site(self, site_id):
+        return {'id': site_id, 'nom': f'Site {site_id}', 'adresse': f'{site_id} rue du Test', 'adresse2': None,
+                'codePostal': '75000', 'ville': 'Paris', 'pays': 'France', 'start': '2015-01-01'}
+
+    def device(self, device_id):
+        return {'id': device_id, 'nom': f'Equipement {device_id}', 'mnemonique': f'EQ{device_id}',
+                'site': {'id': device_id // 100}, 'installationDebut': '2015-01-01', 'installationFin': None,
+                'derniereConnexion': '2024-01-01 00:00:00', 'frequenceCommunication': self.step_minutes}
+
+    def point(self, point_id):
+        return {'id': point_id, 'labelAutomate': f'PT{point_id}', 'labelHumain': f'Compteur {point_id} API',
+                'lastValue': 0.0, 'lastValueDate': '2024-01-01 00:00:00',
+                'device': {'id': point_id // 100, 'site': {'id': point_id // 10000}},
+                'type': {'nom': 'Energie'}, 'subtype': {'nom': 'Electricité'}, 'unit': {'symbole': 'kWh'}}
+
+    def history(self, point_id, date_start, date_end):
+        start = datetime.strptime(date_start, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        end = datetime.strptime(date_end, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        step = timedelta(minutes=self.step_minutes)
+        origin = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        rows = []
+        current = start
+        while current < end:
+            index = (current - origin) / step
+            rows.append({'date': current.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                         'value': round(index * 0.5 + (point_id % 7), 3)})
+            current += step
+        return rows
+
+    def consumption(self, point_id, date_start, date_end):
+        start = datetime.strptime(date_start, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        end = datetime.strptime(date_end, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        rows = []
+        current = start
+        while current < end:
+            rows.append({'date': current.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                         'value': 0.5 * 24 * 60 / self.step_minutes})
+            current += timedelta(days=1)
+        return rows
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps partent en deux écritures: sans TCP_NODELAY, l'algorithme de Nagle et les ACK retardés
+    # ajouteraient environ 40 ms à chaque requête sur une connexion réutilisée
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, extra_headers=None):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        if self.state.rate_limit is not None:
+            remaining = max(self.state.rate_limit - self.state.requests, 0)
+            self.send_header('X-RateLimit-Remaining', str(remaining))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _route(self, method):
+        state = self.state
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        endpoint = '/'.join(parts[1:3]) if len(parts) >= 3 else '/'.join(parts[1:])
+        count = state.count(endpoint)
+
+        body = b''
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+
+        if state.latency:
+            time.sleep(state.latency)
+
+        if state.rate_limit is not None and count > state.rate_limit:
+            return self._send(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+
+        if parts[:1] != ['api']:
+            return self._send(404, {'message': 'Not found'})
+
+        if method == 'POST' and endpoint == 'auth/token':
+            expiration = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            return self._send(200, {'response': {'token': f'token-{count}', 'expiration': expiration}})
+
+        if method == 'POST' and endpoint == 'points/saveConsumption':
+            point_id = int(parts[3])
+            data = json.loads(body or b'{}').get('data', [])
+            with state.lock:
+                state.saved.setdefault(point_id, []).extend(data)
+            return self._send(200, {'response': {'saved': len(data)}})
+
+        if endpoint == 'sites/index' and len(parts) == 3:
+            per_page = min(int(query.get('perPage', 100)), state.per_page_max)
+            page = int(query.get('page', 0))
+            ids = state.site_ids()[page * per_page:(page + 1) * per_page]
+            return self._send(200, {'response': {'sites': [state.site(i) for i in ids],
+                                                 'total': state.n_sites}})
+        if endpoint == 'sites/index':
+            return self._send(200, {'response': {'site': state.site(int(parts[3]))}})
+        if endpoint == 'devices/listBySite':
+            site_id = int(parts[3])
+            return self._send(200, {'response': {'devices': [state.device(i) for i in state.device_ids(site_id)]}})
+        if endpoint == 'devices/index':
+            device_id = int(parts[3])
+            device = state.device(device_id)
+            device['points'] = [state.point(i) for i in state.point_ids(device_id)]
+            return self._send(200, {'response': {'device': device}})
+        if endpoint == 'points/index':
+            return self._send(200, {'response': {'point': state.point(int(parts[3]))}})
+        if endpoint == 'points/history':
+            rows = state.history(int(parts[3]), query['dateStart'], query['dateEnd'])
+            return self._send(200, {'response': {'history': rows}})
+        if endpoint == 'points/consumption':
+            rows = state.consumption(int(parts[3]), query['dateStart'], query['dateEnd'])
+            return self._send(200, {'response': {'consumption': rows}})
+
+        return self._send(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+
+def start_server(port=0, **state_kwargs):
+    """
+    Démarre le serveur dans un thread et renvoie (serveur, état, base_url).
+    """
+    state = MockState(**state_kwargs)
+    handler = type('BoundMockHandler', (MockHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/api'
+    return server, state, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local imitant l'API de GlobalVisio.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=None)
+    parser.add_argument('--step-minutes', type=int, default=10)
+    args = parser.parse_args()
+
+    server, state, base_url = start_server(args.port, latency=args.latency, rate_limit=args.rate_limit,
+                                           step_minutes=args.step_minutes)
+    print(f'Serveur GlobalVisio local démarré sur {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,16 @@ setup(
         'requests>=2.25.1',
         'pytz'
     ],
+    extras_require={
+        'fast': ['orjson'],
+        'async': ['aiohttp'],
+        'parquet': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': [
+            'globalvisio-export=api_globalvisio.export:main',
+        ],
+    },
     author='Antoine Zürcher (Solares Bauen)',
     author_email='zurcher@solares-bauen.fr',
     description='Une API client pour interagir avec la plateforme GlobalVisio.',
@@ -0,0 +1,56 @@
+import pytest
+import requests
+
+from api_globalvisio.scheduler import CircuitBreaker, CircuitOpen, RateLimitExceeded, RequestScheduler
+from api_globalvisio.transport import Transport
+
+
+class _Session:
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{}'
+        return response
+
+    def close(self):
+        pass
+
+
+def _transport(breaker, scheduler):
+    transport = Transport(base_url='http://localhost/api', scheduler=scheduler, breaker=breaker)
+    transport._session = _Session()
+    return transport
+
+
+def test_trial_refused_by_scheduler_does_not_block_endpoint():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    scheduler = RequestScheduler(probe_interval=None)
+    transport = _transport(breaker, scheduler)
+    breaker.failure('history')
+
+    # La requête d'essai est refusée par l'ordonnanceur (quota atteint) avant d'être envoyée
+    scheduler.remaining = 0
+    with pytest.raises(RateLimitExceeded):
+        transport.get('points/history/1?dateStart=2023-01-01&dateEnd=2023-01-02')
+    assert breaker.state('history') == 'half-open'
+
+    # Une fois le quota renouvelé, la requête suivante sert d'essai et referme le disjoncteur
+    scheduler.remaining = None
+    response = transport.get('points/history/1?dateStart=2023-01-01&dateEnd=2023-01-02')
+    assert response.status_code == 200
+    assert transport._session.calls == 1
+    assert breaker.state('history') == 'closed'
+
+
+def test_trial_in_progress_refuses_other_requests():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.failure('history')
+    breaker.before('history')
+    with pytest.raises(CircuitOpen):
+        breaker.before('history')
+    breaker.failure('history')
+    assert breaker.state('history') in ('open', 'half-open')